@@ -1,10 +1,11 @@
 from django.contrib import admin
 
 from .models import (
-    Post, Category, Location, Comment
+    Post, Category, Location, Comment, ImageJob
 )
 
 admin.site.register(Post)
 admin.site.register(Category)
 admin.site.register(Location)
 admin.site.register(Comment)
+admin.site.register(ImageJob)
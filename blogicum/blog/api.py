@@ -0,0 +1,265 @@
+"""Версионированный JSON API только для чтения.
+
+Списки листаются курсором по ключу (дата, id): ?cursor= из поля next
+предыдущего ответа и ?limit= от 1 до MAX_LIMIT. Выборка берёт только
+сериализуемые столбцы через values() и читается пачками, а ответ
+кодируется по одной записи, так что память не зависит от limit.
+"""
+from django.core.files.storage import default_storage
+from django.core.paginator import InvalidPage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import (
+    Http404, JsonResponse, StreamingHttpResponse
+)
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.http import urlencode
+from django.views.generic import View
+from django.views.generic.list import MultipleObjectMixin
+
+from .mixins import QuerySetMixin, post_visibility
+from .models import Category, Comment, Location, Post, User
+from .pagination import NEXT, decode_cursor, encode_cursor
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 1000
+CHUNK_SIZE = 100
+
+POST_FIELDS = (
+    'id', 'title', 'text', 'pub_date', 'image', 'comment_count',
+    'author__username', 'category__slug', 'category__title',
+    'location__name', 'location__is_published',
+)
+PROFILE_FIELDS = ('username', 'first_name', 'last_name', 'date_joined')
+
+encoder = DjangoJSONEncoder(ensure_ascii=False)
+
+
+class BadRequest(Exception):
+    pass
+
+
+def encode_list(results, get_next):
+    """Кодирует список по одной записи, не собирая его в память.
+
+    get_next вызывается, когда results исчерпан.
+    """
+    yield '{"results": ['
+    for index, item in enumerate(results):
+        yield (',' if index else '') + encoder.encode(item)
+    yield '], "next": ' + encoder.encode(get_next()) + '}'
+
+
+def serialize_post(row, request):
+    url = reverse('blog:post_detail', kwargs={'post_id': row['id']})
+    category = None
+    if row['category__slug'] is not None:
+        category = {
+            'slug': row['category__slug'], 'title': row['category__title']
+        }
+    image = None
+    if row['image']:
+        image = request.build_absolute_uri(default_storage.url(row['image']))
+    return {
+        'id': row['id'],
+        'title': row['title'],
+        'text': row['text'],
+        'pub_date': row['pub_date'],
+        'author': row['author__username'],
+        'category': category,
+        'location': (
+            row['location__name'] if row['location__is_published'] else None
+        ),
+        'image': image,
+        'comment_count': row['comment_count'],
+        'url': request.build_absolute_uri(url),
+    }
+
+
+class ApiMixin:
+    """Ошибки API отдаются в JSON, а не HTML-страницей."""
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except Http404 as error:
+            return JsonResponse({'detail': str(error)}, status=404)
+        except BadRequest as error:
+            return JsonResponse({'detail': str(error)}, status=400)
+
+
+class ApiListView(ApiMixin, MultipleObjectMixin, View):
+    """Список с курсором по (date_field, id)."""
+
+    fields = ()
+    date_field = 'created_at'
+    descending = False
+
+    def serialize(self, row):
+        return row
+
+    def get_limit(self):
+        try:
+            limit = int(self.request.GET.get('limit', DEFAULT_LIMIT))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= MAX_LIMIT:
+            raise BadRequest(f'limit должен быть числом от 1 до {MAX_LIMIT}.')
+        return limit
+
+    def get_key(self):
+        cursor = self.request.GET.get('cursor')
+        if cursor is None:
+            return None
+        try:
+            return decode_cursor(cursor)[1]
+        except InvalidPage as error:
+            raise BadRequest(str(error))
+
+    def seek(self, queryset, key):
+        date_field = self.date_field
+        ordering = [date_field, 'id']
+        lookup = 'gt'
+        if self.descending:
+            ordering = [f'-{field}' for field in ordering]
+            lookup = 'lt'
+        if key is not None:
+            date, pk = key
+            # Как и в KeysetPaginator: граница по дате нужна для индекса.
+            queryset = queryset.filter(
+                Q(**{f'{date_field}__{lookup}': date})
+                | Q(**{date_field: date, f'pk__{lookup}': pk}),
+                **{f'{date_field}__{lookup}e': date},
+            )
+        return queryset.order_by(*ordering)
+
+    def get_next_url(self, row):
+        query = urlencode({
+            'cursor': encode_cursor(NEXT, (row[self.date_field], row['id'])),
+            'limit': self.limit,
+        })
+        return self.request.build_absolute_uri(f'{self.request.path}?{query}')
+
+    def paginate(self, rows):
+        """Отдаёт до limit записей; лишняя строка означает, что есть ещё."""
+        self.next_url = None
+        previous = None
+        for index, row in enumerate(rows):
+            if index == self.limit:
+                self.next_url = self.get_next_url(previous)
+                return
+            previous = row
+            yield self.serialize(row)
+
+    def get(self, request, *args, **kwargs):
+        self.limit = self.get_limit()
+        key = self.get_key()
+        fields = {*self.fields, self.date_field, 'id'}
+        rows = self.seek(self.get_queryset(), key).values(*fields)[
+            :self.limit + 1
+        ].iterator(chunk_size=CHUNK_SIZE)
+        chunks = encode_list(self.paginate(rows), lambda: self.next_url)
+        return StreamingHttpResponse(
+            (chunk.encode() for chunk in chunks),
+            content_type='application/json',
+        )
+
+
+class PostListApiView(QuerySetMixin, ApiListView):
+    model = Post
+    fields = POST_FIELDS
+    date_field = 'pub_date'
+    descending = True
+
+    def serialize(self, row):
+        return serialize_post(row, self.request)
+
+
+class CategoryPostListApiView(PostListApiView):
+
+    def get_queryset(self):
+        category = get_object_or_404(
+            Category, is_published=True, slug=self.kwargs['category_slug']
+        )
+        return super().get_queryset().filter(category=category)
+
+
+class ProfilePostListApiView(PostListApiView):
+
+    def get_queryset(self):
+        author = get_object_or_404(User, username=self.kwargs['username'])
+        return super().get_queryset().filter(author=author)
+
+
+class CommentListApiView(ApiListView):
+    model = Comment
+    fields = ('text', 'author__username')
+
+    def get_queryset(self):
+        # Комментарии видны тем, кому видна сама публикация.
+        post = get_object_or_404(
+            Post.objects.filter(post_visibility(self.request.user))
+            .only('pk'),
+            pk=self.kwargs['post_id'],
+        )
+        return super().get_queryset().filter(post=post)
+
+    def serialize(self, row):
+        return {
+            'id': row['id'],
+            'text': row['text'],
+            'author': row['author__username'],
+            'created_at': row['created_at'],
+        }
+
+
+class CategoryListApiView(ApiListView):
+    queryset = Category.objects.filter(is_published=True)
+    fields = ('slug', 'title', 'description')
+
+    def serialize(self, row):
+        return {
+            'slug': row['slug'],
+            'title': row['title'],
+            'description': row['description'],
+            'posts': self.request.build_absolute_uri(reverse(
+                'api_v1:category_posts',
+                kwargs={'category_slug': row['slug']},
+            )),
+        }
+
+
+class LocationListApiView(ApiListView):
+    queryset = Location.objects.filter(is_published=True)
+    fields = ('name',)
+
+    def serialize(self, row):
+        return {'id': row['id'], 'name': row['name']}
+
+
+class PostDetailApiView(ApiMixin, View):
+
+    def get(self, request, *args, **kwargs):
+        row = get_object_or_404(
+            Post.objects.filter(post_visibility(request.user))
+            .values(*POST_FIELDS),
+            pk=self.kwargs['post_id'],
+        )
+        return JsonResponse(
+            serialize_post(row, request),
+            json_dumps_params={'ensure_ascii': False},
+        )
+
+
+class ProfileApiView(ApiMixin, View):
+
+    def get(self, request, *args, **kwargs):
+        row = get_object_or_404(
+            User.objects.values(*PROFILE_FIELDS),
+            username=self.kwargs['username'],
+        )
+        row['posts'] = request.build_absolute_uri(reverse(
+            'api_v1:profile_posts', kwargs={'username': row['username']}
+        ))
+        return JsonResponse(row, json_dumps_params={'ensure_ascii': False})
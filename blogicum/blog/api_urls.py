@@ -0,0 +1,36 @@
+from django.urls import path
+
+from . import api
+
+app_name = 'api_v1'
+
+urlpatterns = [
+    path('posts/', api.PostListApiView.as_view(), name='posts'),
+    path(
+        'posts/<int:post_id>/',
+        api.PostDetailApiView.as_view(),
+        name='post_detail'
+    ),
+    path(
+        'posts/<int:post_id>/comments/',
+        api.CommentListApiView.as_view(),
+        name='comments'
+    ),
+    path('categories/', api.CategoryListApiView.as_view(), name='categories'),
+    path(
+        'categories/<slug:category_slug>/posts/',
+        api.CategoryPostListApiView.as_view(),
+        name='category_posts'
+    ),
+    path('locations/', api.LocationListApiView.as_view(), name='locations'),
+    path(
+        'profiles/<slug:username>/',
+        api.ProfileApiView.as_view(),
+        name='profile'
+    ),
+    path(
+        'profiles/<slug:username>/posts/',
+        api.ProfilePostListApiView.as_view(),
+        name='profile_posts'
+    ),
+]
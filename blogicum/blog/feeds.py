@@ -0,0 +1,179 @@
+"""RSS- и Atom-ленты главной страницы, категорий и авторов.
+
+Ленты отдаются потоком: заголовок ленты, затем по одной записи на каждую
+публикацию из выборки, которая читается из базы пачками. Собранный
+ответ кэшируется под теми же версиями, что и HTML-страница этой ленты.
+"""
+import io
+
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils import feedgenerator
+from django.utils.xmlutils import SimplerXMLGenerator
+from django.views.generic import View
+from django.views.generic.list import MultipleObjectMixin
+
+from core.cache import ConditionalGetMixin, version_time, versioned_key
+
+from .mixins import QuerySetMixin
+from .models import Category, Post, User
+
+FEED_PREFIX = 'feed:'
+FEED_LENGTH = 50
+CHUNK_SIZE = 20
+FEED_TYPES = {
+    'rss': feedgenerator.Rss201rev2Feed,
+    'atom': feedgenerator.Atom1Feed,
+}
+
+
+def _xml(write):
+    buffer = io.StringIO()
+    handler = SimplerXMLGenerator(buffer, 'utf-8', short_empty_elements=True)
+    write(handler)
+    return buffer.getvalue()
+
+
+def stream_feed(feed, items):
+    """Пишет ленту feedgenerator по частям, не собирая items в список.
+
+    Генератор ленты умеет писать только целиком, поэтому он выводит ленту
+    без записей, а записи вставляются перед закрывающим тегом корня.
+    """
+    document = feed.writeString('utf-8')
+    closing = '</channel>' if '</channel>' in document else '</feed>'
+    head, _, tail = document.rpartition(closing)
+    yield head
+    for item in items:
+        feed.items = []
+        feed.add_item(**item)
+        yield _xml(feed.write_items)
+    yield closing + tail
+
+
+class BaseFeedView(ConditionalGetMixin, QuerySetMixin, MultipleObjectMixin,
+                   View):
+    """Лента последних публикаций в формате из URL: rss или atom."""
+
+    model = Post
+    ordering = ['-pub_date', '-id']
+    feed_title = 'Блогикум'
+    feed_description = 'Новые публикации'
+    # Описание элемента — полный текст.
+    deferred_fields = ('text_html',)
+    query_budget = 4
+
+    def get_feed_type(self):
+        try:
+            return FEED_TYPES[self.kwargs['feed_format']]
+        except KeyError:
+            raise Http404('Неизвестный формат ленты.')
+
+    def get_page_url(self):
+        return reverse('blog:index')
+
+    def get_item(self, post):
+        link = self.request.build_absolute_uri(
+            reverse('blog:post_detail', kwargs={'post_id': post.pk})
+        )
+        return {
+            'title': post.title,
+            'link': link,
+            'unique_id': link,
+            'description': post.text,
+            'author_name': post.author.get_username(),
+            'pubdate': post.pub_date,
+            'updateddate': post.updated_at,
+            'categories': [post.category.title] if post.category else None,
+        }
+
+    def get_feed(self, feed_type):
+        updated = max(map(version_time, self.current_versions))
+        feed = feed_type(
+            title=self.feed_title,
+            link=self.request.build_absolute_uri(self.get_page_url()),
+            description=self.feed_description,
+            language='ru',
+            feed_url=self.request.build_absolute_uri(),
+        )
+        # Без записей генератор поставил бы в ленту текущее время.
+        feed.latest_post_date = lambda: updated
+        return feed
+
+    def get(self, request, *args, **kwargs):
+        feed_type = self.get_feed_type()
+        # В ленте абсолютные ссылки, поэтому ключ включает домен.
+        key = versioned_key(
+            FEED_PREFIX, self.current_versions, request.build_absolute_uri()
+        )
+        content_type = feed_type.content_type
+        cached = cache.get(key)
+        if cached is not None:
+            return HttpResponse(cached, content_type=content_type)
+        posts = self.get_queryset()[:FEED_LENGTH].iterator(
+            chunk_size=CHUNK_SIZE
+        )
+        chunks = stream_feed(
+            self.get_feed(feed_type), map(self.get_item, posts)
+        )
+        return StreamingHttpResponse(
+            self.cache_when_complete(key, chunks),
+            content_type=content_type,
+        )
+
+    @staticmethod
+    def cache_when_complete(key, chunks):
+        # Недочитанную клиентом ленту кэшировать нельзя.
+        parts = []
+        for chunk in chunks:
+            chunk = chunk.encode()
+            parts.append(chunk)
+            yield chunk
+        cache.set(key, b''.join(parts), None)
+
+
+class PostFeedView(BaseFeedView):
+
+    def get_cache_versions(self):
+        return ['feed']
+
+
+class CategoryFeedView(BaseFeedView):
+
+    def get_cache_versions(self):
+        return [f'category:{self.kwargs["category_slug"]}']
+
+    def get_page_url(self):
+        return reverse(
+            'blog:category_posts',
+            kwargs={'category_slug': self.category.slug},
+        )
+
+    def get_queryset(self):
+        self.category = get_object_or_404(
+            Category, is_published=True, slug=self.kwargs['category_slug']
+        )
+        self.feed_title = f'Блогикум: {self.category.title}'
+        self.feed_description = self.category.description
+        return super().get_queryset().filter(category=self.category)
+
+
+class ProfileFeedView(BaseFeedView):
+
+    def get_cache_versions(self):
+        return [f'author:{self.kwargs["username"]}']
+
+    def get_page_url(self):
+        return reverse(
+            'blog:profile', kwargs={'username': self.author.username}
+        )
+
+    def get_queryset(self):
+        self.author = get_object_or_404(User, username=self.kwargs['username'])
+        self.feed_title = f'Блогикум: {self.author.username}'
+        self.feed_description = (
+            f'Публикации пользователя {self.author.username}'
+        )
+        return super().get_queryset().filter(author=self.author)
@@ -0,0 +1,110 @@
+"""Уменьшенные копии Post.image для адаптивных <img srcset>.
+
+Имена вариантов строятся от оригинала: photo.jpg → photo.card.jpg,
+photo.card.webp и т. д.; хранилище может сохранить файл под другим
+именем, и в описание попадает итоговое. Описание хранится в
+Post.image_variants:
+{'card': {'name': ..., 'width': ..., 'height': ..., 'webp': ...}, ...}.
+Пустой словарь значит, что вариантов ещё нет, и шаблоны показывают
+оригинал.
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+JPEG_OPTIONS = {'quality': 82, 'optimize': True, 'progressive': True}
+PNG_OPTIONS = {'optimize': True}
+WEBP_OPTIONS = {'quality': 80, 'method': 4}
+
+
+def variant_name(name, variant, extension):
+    root, _ = os.path.splitext(name)
+    return f'{root}.{variant}.{extension}'
+
+
+def _encode(image, image_format, options):
+    # Метаданные не передаются в save(), поэтому EXIF в копию не попадает.
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def _open(storage, name):
+    with storage.open(name) as source:
+        image = Image.open(source)
+        # Поворот из EXIF переносится в сами пиксели.
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    transparent = image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+    if transparent:
+        return image.convert('RGBA'), 'png', 'PNG', PNG_OPTIONS
+    return image.convert('RGB'), 'jpg', 'JPEG', JPEG_OPTIONS
+
+
+def generate_variants(name, storage=default_storage):
+    """Пишет варианты изображения name и возвращает их описание.
+
+    Изображение не увеличивается: варианты, которые вышли бы одной
+    ширины, делят один файл.
+    """
+    webp = settings.POST_IMAGE_WEBP and features.check('webp')
+    original, extension, image_format, options = _open(storage, name)
+    variants = {}
+    by_width = {}
+    sizes = sorted(settings.POST_IMAGE_VARIANTS.items(), key=lambda x: x[1])
+    for variant, max_width in sizes:
+        width = min(max_width, original.width)
+        if width not in by_width:
+            height = max(1, round(original.height * width / original.width))
+            image = original
+            if width != original.width:
+                image = original.resize(
+                    (width, height), Image.Resampling.LANCZOS
+                )
+            entry = {
+                'name': storage.save(
+                    variant_name(name, variant, extension),
+                    _encode(image, image_format, options),
+                ),
+                'width': width,
+                'height': height,
+            }
+            if webp:
+                entry['webp'] = storage.save(
+                    variant_name(name, variant, 'webp'),
+                    _encode(image, 'WEBP', WEBP_OPTIONS),
+                )
+            by_width[width] = entry
+        variants[variant] = by_width[width]
+    return variants
+
+
+def try_generate_variants(name, storage=default_storage):
+    """generate_variants, но битый файл даёт пустое описание, а не ошибку."""
+    try:
+        return generate_variants(name, storage)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.warning('Не удалось подготовить варианты %s', name,
+                       exc_info=True)
+        return {}
+
+
+def variant_files(variants):
+    return {
+        entry[key] for entry in variants.values()
+        for key in ('name', 'webp') if key in entry
+    }
+
+
+def delete_variants(variants, storage=default_storage):
+    for name in variant_files(variants):
+        storage.delete(name)
@@ -0,0 +1,91 @@
+"""Очередь обработки фото в таблице ImageJob.
+
+Запрос только ставит задание в той же транзакции, что и публикацию;
+варианты готовит команда process_image_jobs. Пока их нет, шаблоны
+показывают оригинал.
+
+Обработчик забирает задания, помечая их своим токеном: на SQLite
+запись и так идёт по одному, на базах с SELECT ... FOR UPDATE SKIP LOCKED
+обработчики не ждут друг друга. Взятое задание держится LEASE секунд;
+если обработчик за это время не отчитался (упал, был убит), задание
+снова становится доступным.
+"""
+import uuid
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import ImageJob
+
+LEASE = 600
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 60
+
+
+def enqueue(post_id, image):
+    """Ставит задание; невыполненное задание той же публикации заменяется.
+
+    Сброс claimed_by не даёт обработчику старого фото удалить новое
+    задание, когда он закончит.
+    """
+    ImageJob.objects.update_or_create(
+        post_id=post_id,
+        defaults={
+            'image': image,
+            'status': ImageJob.PENDING,
+            'attempts': 0,
+            'run_after': timezone.now(),
+            'claimed_by': '',
+            'last_error': '',
+        },
+    )
+
+
+def cancel(post_id):
+    ImageJob.objects.filter(post_id=post_id).delete()
+
+
+def _due(now):
+    return Q(
+        status__in=(ImageJob.PENDING, ImageJob.RUNNING), run_after__lte=now
+    )
+
+
+def claim(limit, lease=LEASE):
+    """Забирает до limit заданий, срок которых наступил."""
+    token = uuid.uuid4().hex
+    now = timezone.now()
+    with transaction.atomic():
+        pks = list(
+            ImageJob.objects.select_for_update(skip_locked=True)
+            .filter(_due(now)).order_by('run_after', 'pk')
+            .values_list('pk', flat=True)[:limit]
+        )
+        # Условие повторяется: задание мог забрать другой обработчик.
+        ImageJob.objects.filter(_due(now), pk__in=pks).update(
+            status=ImageJob.RUNNING,
+            run_after=now + timedelta(seconds=lease),
+            attempts=F('attempts') + 1,
+            claimed_by=token,
+        )
+    return list(ImageJob.objects.filter(claimed_by=token).order_by('pk'))
+
+
+def complete(job):
+    ImageJob.objects.filter(pk=job.pk, claimed_by=job.claimed_by).delete()
+
+
+def fail(job, error, max_attempts=MAX_ATTEMPTS):
+    """Откладывает задание с растущей паузой или помечает упавшим."""
+    jobs = ImageJob.objects.filter(pk=job.pk, claimed_by=job.claimed_by)
+    if job.attempts >= max_attempts:
+        jobs.update(status=ImageJob.FAILED, last_error=error)
+        return
+    delay = RETRY_DELAY * 2 ** (job.attempts - 1)
+    jobs.update(
+        status=ImageJob.PENDING,
+        run_after=timezone.now() + timedelta(seconds=delay),
+        last_error=error,
+    )
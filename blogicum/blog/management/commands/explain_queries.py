@@ -0,0 +1,96 @@
+import re
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.utils import timezone
+
+from blog import views
+from blog.models import Category, Comment, Post, User
+from blog.pagination import NEXT, KeysetPaginator
+
+# Признаки плохого плана в выводе EXPLAIN QUERY PLAN SQLite.
+TEMP_SORT = 'USE TEMP B-TREE'
+# Строки плана начинаются с номеров (id parent notused) или с псевдографики.
+PLAN_PREFIX = re.compile(r'^[\d\s|`-]*')
+
+
+def is_full_scan(detail):
+    """SCAN без индекса — полный просмотр таблицы."""
+    return detail.startswith('SCAN') and ' USING ' not in detail
+
+
+class Command(BaseCommand):
+    help = (
+        'Печатает EXPLAIN QUERY PLAN для запросов ленты, категории, профиля '
+        'и комментариев и отмечает полные просмотры таблиц и сортировки '
+        'во временном B-дереве.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--strict', action='store_true',
+            help='Завершиться с ошибкой, если найден плохой план.'
+        )
+
+    def handle(self, *args, strict, **options):
+        problems = 0
+        for name, queryset in self.get_querysets():
+            plan = queryset.explain()
+            details = [
+                PLAN_PREFIX.sub('', line) for line in plan.splitlines()
+            ]
+            bad = [
+                detail for detail in details
+                if is_full_scan(detail) or TEMP_SORT in detail
+            ]
+            style = self.style.ERROR if bad else self.style.SUCCESS
+            self.stdout.write(style(f'{name}: {"ПЛОХО" if bad else "OK"}'))
+            for line in plan.splitlines():
+                self.stdout.write(f'    {line}')
+            problems += len(bad)
+        if strict and problems:
+            raise CommandError(f'Найдено проблемных шагов плана: {problems}')
+
+    def get_view_queryset(self, view_class, user=None, **kwargs):
+        request = RequestFactory().get('/')
+        request.user = user or AnonymousUser()
+        view = view_class()
+        view.setup(request, **kwargs)
+        return view.get_queryset()
+
+    def paginated(self, name, queryset):
+        paginator = KeysetPaginator(queryset, views.POSTS_ON_PAGE)
+        yield f'{name} (?page=1)', queryset[:views.POSTS_ON_PAGE]
+        cursor_key = (timezone.now(), 0)
+        yield f'{name} (?cursor=)', paginator.seek_queryset(
+            NEXT, cursor_key
+        )[:views.POSTS_ON_PAGE + 1]
+
+    def get_querysets(self):
+        yield from self.paginated(
+            'blog:index', self.get_view_queryset(views.PostListView)
+        )
+        category = Category.objects.filter(is_published=True).first()
+        if category is not None:
+            yield from self.paginated(
+                'blog:category_posts',
+                self.get_view_queryset(
+                    views.CategoryListView, category_slug=category.slug
+                ),
+            )
+        author = User.objects.filter(post__isnull=False).first()
+        if author is not None:
+            for label, viewer in (('гость', None), ('автор', author)):
+                yield from self.paginated(
+                    f'blog:profile ({label})',
+                    self.get_view_queryset(
+                        views.ProfileListView, user=viewer,
+                        username=author.username,
+                    ),
+                )
+        post = Post.objects.first()
+        if post is not None:
+            yield 'blog:post_detail (комментарии)', (
+                Comment.objects.filter(post=post).select_related('author')
+            )
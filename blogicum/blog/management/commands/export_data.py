@@ -0,0 +1,191 @@
+import csv
+import gzip
+import json
+from contextlib import nullcontext
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from blog.models import Category, Comment, Location, Post, User
+
+# Что выгружается из каждой модели. Пароли и почта в выгрузку не попадают.
+EXPORTS = {
+    'posts': (Post, (
+        'id', 'title', 'text', 'pub_date', 'created_at', 'updated_at',
+        'is_published', 'is_live', 'author_id', 'category_id',
+        'location_id', 'image', 'comment_count',
+    )),
+    'comments': (Comment, (
+        'id', 'post_id', 'author_id', 'text', 'created_at', 'is_published',
+    )),
+    'categories': (Category, (
+        'id', 'slug', 'title', 'description', 'is_published', 'created_at',
+        'updated_at',
+    )),
+    'locations': (Location, (
+        'id', 'name', 'is_published', 'created_at', 'updated_at',
+    )),
+    'users': (User, (
+        'id', 'username', 'first_name', 'last_name', 'is_staff',
+        'is_active', 'date_joined', 'last_login',
+    )),
+}
+FORMATS = ('jsonl', 'csv')
+
+
+class JsonLinesWriter:
+    def __init__(self, stream, fields):
+        self.stream = stream
+        self.fields = fields
+        self.encoder = DjangoJSONEncoder(ensure_ascii=False)
+
+    def write_header(self):
+        pass
+
+    def write_rows(self, rows):
+        self.stream.writelines(
+            self.encoder.encode(dict(zip(self.fields, row))) + '\n'
+            for row in rows
+        )
+
+    @staticmethod
+    def read_last_pk(stream):
+        last_line = None
+        for line in stream:
+            if line.strip():
+                last_line = line
+        return None if last_line is None else json.loads(last_line)['id']
+
+
+class CsvWriter:
+    def __init__(self, stream, fields):
+        self.writer = csv.writer(stream)
+        self.fields = fields
+
+    def write_header(self):
+        self.writer.writerow(self.fields)
+
+    def write_rows(self, rows):
+        self.writer.writerows(
+            [
+                value.isoformat() if isinstance(value, date) else value
+                for value in row
+            ]
+            for row in rows
+        )
+
+    @staticmethod
+    def read_last_pk(stream):
+        # Поля с переводами строк занимают несколько строк файла.
+        last_row = None
+        for last_row in csv.reader(stream):
+            pass
+        if not last_row or last_row[0] == 'id':
+            return None
+        return int(last_row[0])
+
+
+WRITERS = {'jsonl': JsonLinesWriter, 'csv': CsvWriter}
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает публикации, комментарии, категории, местоположения или '
+        'пользователей в JSON Lines или CSV. Строки читаются пачками по '
+        'первичному ключу и пишутся в файл сразу; с --resume выгрузка '
+        'продолжается после последней строки уже записанного файла.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=sorted(EXPORTS))
+        parser.add_argument(
+            '--format', dest='output_format', choices=FORMATS,
+            default='jsonl',
+            help='Формат строк: JSON Lines или CSV.'
+        )
+        parser.add_argument(
+            '--output', default='-',
+            help='Файл выгрузки; по умолчанию — стандартный вывод.'
+        )
+        parser.add_argument(
+            '--gzip', dest='compress', action='store_true',
+            help='Сжимать файл выгрузки gzip.'
+        )
+        parser.add_argument(
+            '--after-pk', type=int, default=0,
+            help='Выгружать строки с первичным ключом больше этого.'
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Дописать в --output строки после последней в нём.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=2000,
+            help='Сколько строк читать из базы одним запросом.'
+        )
+
+    def handle(self, *args, model, output_format, output, compress, after_pk,
+               resume, batch_size, **options):
+        to_stdout = output == '-'
+        if to_stdout and (compress or resume):
+            raise CommandError('--gzip и --resume требуют --output.')
+        model_class, fields = EXPORTS[model]
+        writer_class = WRITERS[output_format]
+        append = False
+        if resume:
+            last_pk = self.last_exported_pk(output, compress, writer_class)
+            append = last_pk is not None
+            after_pk = max(after_pk, last_pk or 0)
+        # При выводе в stdout отчёт не должен смешиваться с данными.
+        log = self.stderr if to_stdout else self.stdout
+        if to_stdout:
+            target = nullcontext(self.stdout)
+        else:
+            target = self.open(output, compress, 'at' if append else 'wt')
+        with target as stream:
+            writer = writer_class(stream, fields)
+            if not append:
+                writer.write_header()
+            exported, last_pk = self.export(
+                model_class, fields, writer, after_pk, batch_size, log,
+                options['verbosity'],
+            )
+        log.write(
+            f'Выгружено строк: {exported}, последний id: {last_pk}',
+            style_func=self.style.SUCCESS,
+        )
+
+    @staticmethod
+    def open(path, compressed, mode):
+        # newline='' нужен модулю csv, для JSON Lines он ничего не меняет.
+        if compressed:
+            return gzip.open(path, mode, encoding='utf-8', newline='')
+        return open(path, mode, encoding='utf-8', newline='')
+
+    def last_exported_pk(self, path, compressed, writer_class):
+        """id последней строки файла; файл дочитывается потоком."""
+        try:
+            with self.open(path, compressed, 'rt') as stream:
+                return writer_class.read_last_pk(stream)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, ValueError, KeyError) as error:
+            raise CommandError(
+                f'Не удалось найти последнюю строку в {path}: {error}'
+            )
+
+    def export(self, model, fields, writer, after_pk, batch_size, log,
+               verbosity):
+        rows = model._base_manager.order_by('pk').values_list(*fields)
+        exported = 0
+        last_pk = after_pk
+        while True:
+            batch = list(rows.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                return exported, last_pk
+            writer.write_rows(batch)
+            last_pk = batch[-1][0]
+            exported += len(batch)
+            if verbosity >= 2:
+                log.write(f'{exported} строк, последний id: {last_pk}')
@@ -0,0 +1,303 @@
+import gzip
+import json
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.core import serializers
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.core.serializers.base import DeserializationError
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections
+from django.db import transaction
+from django.utils import timezone
+
+from blog import search
+from blog.models import Category, Comment, Location, Post, User
+from blog.signals import post_page_versions, recount_comments
+from core.cache import bump_versions
+
+# Порядок вставки внутри транзакции: сначала те, на кого ссылаются.
+IMPORTED_MODELS = (User, Category, Location, Post, Comment)
+READ_SIZE = 1 << 16
+SEPARATORS = ' \t\r\n,'
+
+
+def iter_json_array(stream, read_size=READ_SIZE):
+    """Элементы JSON-массива верхнего уровня по одному, без чтения файла
+    целиком: буфер держит только ещё не разобранный хвост.
+    """
+    decoder = json.JSONDecoder()
+    buffer = stream.read(read_size).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError('Ожидался JSON-массив объектов.')
+    position = 1
+    while True:
+        while position < len(buffer) and buffer[position] in SEPARATORS:
+            position += 1
+        if buffer.startswith(']', position):
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as error:
+            # Объект не поместился в буфер — дочитываем файл.
+            chunk = stream.read(read_size)
+            if not chunk:
+                raise ValueError(f'Файл оборван или повреждён: {error}')
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item
+
+
+def timestamp_fields(model):
+    """Поля auto_now и auto_now_add: bulk_create, как и save(), заполняет
+    их текущим временем.
+    """
+    return [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+
+
+@contextmanager
+def timestamps_from_file(fields):
+    """Снимает auto_now и auto_now_add с полей на время вставки, чтобы
+    bulk_create записал даты из файла за один проход.
+
+    Флаги общие для процесса, но команда выполняется в своём.
+    """
+    flags = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in flags:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает фикстуры в формате db.json (dumpdata --format json) '
+        'потоком: объекты blog.category, blog.location, blog.post, '
+        'blog.comment и auth.user вставляются через bulk_create пачками, '
+        'по транзакции на --chunk-size объектов. Прочие модели пропускаются. '
+        'Сигналы не вызываются: отметки is_live, счётчики комментариев и '
+        'поисковый индекс заполняются самой командой.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'fixtures', nargs='+',
+            help='Пути к JSON-файлам; файлы .gz распаковываются на лету.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько объектов одной модели вставлять одним запросом.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=20000,
+            help='Сколько объектов вставлять в одной транзакции.'
+        )
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='База, в которую загружаются фикстуры.'
+        )
+
+    def handle(self, *args, fixtures, batch_size, chunk_size, database,
+               **options):
+        self.using = database
+        self.batch_size = batch_size
+        self.verbosity = options['verbosity']
+        self.counts = Counter()
+        self.skipped = Counter()
+        # Что загружено: по этим id в конце сбрасываются версии страниц.
+        self.post_ids = set()
+        self.commented_post_ids = set()
+        self.category_ids = set()
+        self.author_ids = set()
+        self.started = time.monotonic()
+        connection = connections[database]
+        # Ссылки вперёд (публикация раньше своего автора, как в db.json)
+        # проверяются один раз в конце, как это делает loaddata.
+        with connection.constraint_checks_disabled():
+            for path in fixtures:
+                with self.open(path) as stream:
+                    try:
+                        self.import_stream(stream, chunk_size)
+                    except (ValueError, DeserializationError) as error:
+                        raise CommandError(f'Ошибка в {path}: {error}')
+                    except IntegrityError as error:
+                        raise CommandError(
+                            f'{path}: {error}. Команда только добавляет '
+                            'объекты; для обновления существующих '
+                            'используйте loaddata.'
+                        )
+        self.finish(connection)
+
+    def open(self, path):
+        try:
+            if path.endswith('.gz'):
+                return gzip.open(path, 'rt', encoding='utf-8')
+            return open(path, encoding='utf-8')
+        except OSError as error:
+            raise CommandError(f'Не удалось открыть {path}: {error}')
+
+    def import_stream(self, stream, chunk_size):
+        objects = serializers.deserialize(
+            'python', self.filter_models(iter_json_array(stream)),
+            using=self.using,
+        )
+        exhausted = False
+        while not exhausted:
+            buffers = defaultdict(list)
+            taken = 0
+            with transaction.atomic(using=self.using):
+                for taken, deserialized in enumerate(objects, 1):
+                    model = type(deserialized.object)
+                    buffers[model].append(deserialized)
+                    if len(buffers[model]) >= self.batch_size:
+                        self.insert(model, buffers.pop(model))
+                    if taken == chunk_size:
+                        break
+                else:
+                    exhausted = True
+                for model in IMPORTED_MODELS:
+                    if model in buffers:
+                        self.insert(model, buffers.pop(model))
+            if taken and self.verbosity >= 2:
+                self.report()
+
+    def filter_models(self, items):
+        labels = {model._meta.label_lower for model in IMPORTED_MODELS}
+        for item in items:
+            if item.get('model') in labels:
+                yield item
+            else:
+                self.skipped[item.get('model')] += 1
+
+    def insert(self, model, batch):
+        instances = [deserialized.object for deserialized in batch]
+        fields = timestamp_fields(model)
+        self.prepare(model, instances, fields)
+        with timestamps_from_file(fields):
+            model._base_manager.db_manager(self.using).bulk_create(instances)
+        self.insert_m2m(model, batch)
+        if model is Post:
+            search.write_rows([
+                search.post_row(post.pk, post.title, post.text)
+                for post in instances
+            ])
+            for post in instances:
+                self.post_ids.add(post.pk)
+                self.category_ids.add(post.category_id)
+                self.author_ids.add(post.author_id)
+        elif model is Comment:
+            self.commented_post_ids.update(
+                comment.post_id for comment in instances
+            )
+            search.write_rows([
+                search.comment_row(comment.pk, comment.text, comment.post_id)
+                for comment in instances
+            ])
+        self.counts[model._meta.label_lower] += len(instances)
+
+    def prepare(self, model, instances, fields):
+        """То, что при обычном save() сделали бы auto_now и Post.save().
+
+        Даты fields, которых нет в файле, получают текущее время.
+        """
+        now = timezone.now()
+        for instance in instances:
+            for field in fields:
+                if getattr(instance, field.attname) is None:
+                    setattr(instance, field.attname, now)
+            if model is Post:
+                instance.is_live = instance.pub_date <= now
+                instance.render_text()
+
+    def insert_m2m(self, model, batch):
+        for field in model._meta.many_to_many:
+            through = field.remote_field.through
+            source = field.m2m_field_name() + '_id'
+            target = field.m2m_reverse_field_name() + '_id'
+            rows = [
+                through(**{source: deserialized.object.pk, target: value})
+                for deserialized in batch
+                for value in deserialized.m2m_data.get(field.name, ())
+            ]
+            through._base_manager.db_manager(self.using).bulk_create(
+                rows, ignore_conflicts=True
+            )
+
+    def finish(self, connection):
+        imported = [
+            model for model in IMPORTED_MODELS
+            if self.counts[model._meta.label_lower]
+        ]
+        try:
+            connection.check_constraints(
+                table_names=[model._meta.db_table for model in imported]
+            )
+        except IntegrityError as error:
+            raise CommandError(
+                f'Объекты загружены, но ссылаются на отсутствующие: {error}'
+            )
+        # Первичные ключи пришли из файла — счётчики последовательностей
+        # (PostgreSQL и др.) нужно сдвинуть за них.
+        statements = connection.ops.sequence_reset_sql(no_style(), imported)
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+        # Счётчики только тех публикаций, к которым пришли комментарии.
+        commented = sorted(self.commented_post_ids)
+        for start in range(0, len(commented), self.batch_size):
+            recount_comments(Post.objects.using(self.using).filter(
+                pk__in=commented[start:start + self.batch_size]
+            ))
+        if Post in imported or Comment in imported:
+            search.optimize()
+        self.bump_page_versions()
+        self.report()
+        if self.skipped:
+            skipped = ', '.join(
+                f'{label}: {count}' for label, count in self.skipped.items()
+            )
+            self.stdout.write(f'Пропущено: {skipped}')
+
+    def bump_page_versions(self):
+        """Сбрасывает в общем кэше страницы, где видны загруженные объекты.
+
+        Сигналы при bulk_create не срабатывают. Страниц самих загруженных
+        объектов в кэше ещё нет, поэтому сбрасываются ленты, куда попали
+        новые публикации, и страницы прежних публикаций с новыми
+        комментариями вместе с их лентами.
+        """
+        commented = sorted(self.commented_post_ids - self.post_ids)
+        category_ids, author_ids = set(self.category_ids), set(self.author_ids)
+        for start in range(0, len(commented), self.batch_size):
+            for category_id, author_id in Post.objects.using(
+                self.using
+            ).filter(
+                pk__in=commented[start:start + self.batch_size]
+            ).values_list('category_id', 'author_id'):
+                category_ids.add(category_id)
+                author_ids.add(author_id)
+        if self.post_ids or commented:
+            bump_versions(
+                *post_page_versions(commented, category_ids, author_ids)
+            )
+
+    def report(self):
+        total = sum(self.counts.values())
+        elapsed = time.monotonic() - self.started
+        details = ', '.join(
+            f'{label}: {count}' for label, count in self.counts.items()
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено объектов: {total} за {elapsed:.1f} с '
+            f'({total / max(elapsed, 1e-6):.0f} объектов/с). {details}'
+        ))
@@ -0,0 +1,109 @@
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from blog import images, jobs
+from blog.models import Post
+from blog.signals import post_page_versions, touch_cards
+from core.cache import bump_versions
+
+logger = logging.getLogger(__name__)
+
+
+def generate(name):
+    """Выполняется в дочернем процессе: ошибка возвращается, а не
+    поднимается, чтобы одно фото не прерывало всю пачку.
+    """
+    try:
+        return images.generate_variants(name), ''
+    except Exception as error:
+        return {}, f'{type(error).__name__}: {error}'
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет очередь обработки фото публикаций: готовит варианты в '
+        'пуле процессов и записывает их в публикации. Без --loop '
+        'завершается, когда очередь пуста.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count(),
+            help='Сколько процессов обрабатывают фото.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=20,
+            help='Сколько заданий забирать из очереди за раз.'
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Не завершаться, а ждать новых заданий.'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=2.0,
+            help='Пауза в секундах между проверками пустой очереди.'
+        )
+        parser.add_argument(
+            '--lease', type=int, default=jobs.LEASE,
+            help='Через сколько секунд невыполненное задание снова '
+                 'становится доступным.'
+        )
+        parser.add_argument(
+            '--max-attempts', type=int, default=jobs.MAX_ATTEMPTS,
+            help='После стольких ошибок задание помечается упавшим.'
+        )
+
+    def handle(self, *args, processes, batch_size, loop, interval, lease,
+               max_attempts, **options):
+        self.max_attempts = max_attempts
+        done = failed = 0
+        # Дочерние процессы не должны унаследовать открытое соединение.
+        connections.close_all()
+        with ProcessPoolExecutor(processes) as pool:
+            while True:
+                batch = jobs.claim(batch_size, lease)
+                if batch:
+                    batch_done, batch_failed = self.process(pool, batch)
+                    done += batch_done
+                    failed += batch_failed
+                elif loop:
+                    time.sleep(interval)
+                else:
+                    break
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано фото: {done}, с ошибкой: {failed}'
+        ))
+
+    def process(self, pool, batch):
+        results = pool.map(generate, [job.image for job in batch])
+        ready = []
+        failed = 0
+        for job, (variants, error) in zip(batch, results):
+            if error:
+                logger.warning('Не удалось подготовить варианты %s: %s',
+                               job.image, error)
+                jobs.fail(job, error, self.max_attempts)
+                failed += 1
+                continue
+            # Фото могли заменить, пока готовились варианты.
+            if touch_cards(
+                Post.objects.filter(pk=job.post_id, image=job.image),
+                image_variants=variants,
+            ):
+                ready.append(job.post_id)
+            else:
+                images.delete_variants(variants)
+            jobs.complete(job)
+        if ready:
+            _, category_ids, author_ids = zip(*Post.objects.filter(
+                pk__in=ready
+            ).values_list('pk', 'category_id', 'author_id'))
+            bump_versions(*post_page_versions(
+                ready, set(category_ids), set(author_ids)
+            ))
+        return len(ready), failed
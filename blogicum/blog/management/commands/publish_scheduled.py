@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.publishing import publish_due_posts
+
+
+class Command(BaseCommand):
+    help = (
+        'Выпускает в ленту отложенные публикации, дата которых наступила. '
+        'С --loop работает постоянно, проверяя очередь раз в --interval '
+        'секунд.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Не завершаться, а проверять очередь периодически.'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=15,
+            help='Пауза между проверками в режиме --loop, в секундах.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько публикаций выпускать одним запросом.'
+        )
+
+    def handle(self, *args, loop, interval, batch_size, **options):
+        while True:
+            published = publish_due_posts(batch_size)
+            if published or not loop:
+                self.stdout.write(f'Выпущено публикаций: {published}')
+            if not loop:
+                return
+            time.sleep(interval)
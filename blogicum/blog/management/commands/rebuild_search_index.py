@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from blog import search
+from blog.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Перестраивает поисковый индекс публикаций и комментариев пачками '
+        'по первичному ключу. Нужна после loaddata и массовых загрузок, '
+        'которые не вызывают сигналы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько строк индексировать за одну вставку.'
+        )
+
+    def handle(self, *args, batch_size, **options):
+        if not search.is_supported():
+            raise CommandError('Поиск работает только на SQLite с FTS5.')
+        with transaction.atomic():
+            search.clear()
+            posts = self.index(
+                Post.objects.values_list('pk', 'title', 'text'),
+                search.post_row, batch_size,
+            )
+            comments = self.index(
+                Comment.objects.values_list('pk', 'text', 'post_id'),
+                search.comment_row, batch_size,
+            )
+        search.optimize()
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано публикаций: {posts}, комментариев: {comments}'
+        ))
+
+    def index(self, rows, make_row, batch_size):
+        last_pk = 0
+        indexed = 0
+        while True:
+            batch = list(
+                rows.filter(pk__gt=last_pk).order_by('pk')[:batch_size]
+            )
+            if not batch:
+                return indexed
+            search.write_rows([make_row(*row) for row in batch])
+            last_pk = batch[-1][0]
+            indexed += len(batch)
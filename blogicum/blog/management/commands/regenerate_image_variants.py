@@ -0,0 +1,80 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from blog import images
+from blog.models import Post
+from blog.signals import post_page_versions, touch_cards
+from core.cache import bump_versions
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново готовит уменьшенные варианты фото публикаций в пуле '
+        'процессов. Нужна после смены POST_IMAGE_VARIANTS и для фото, '
+        'загруженных до появления вариантов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count(),
+            help='Сколько процессов обрабатывают фото.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Сколько публикаций выбирать из базы за раз.'
+        )
+        parser.add_argument(
+            '--missing-only', action='store_true',
+            help='Только публикации, у которых вариантов ещё нет.'
+        )
+
+    def handle(self, *args, processes, batch_size, missing_only, **options):
+        posts = Post.objects.exclude(image='').order_by('pk')
+        if missing_only:
+            posts = posts.filter(image_variants={})
+        posts = posts.values_list(
+            'pk', 'image', 'image_variants', 'category_id', 'author_id'
+        )
+        done = failed = 0
+        last_pk = 0
+        # Дочерние процессы не должны унаследовать открытое соединение.
+        connections.close_all()
+        with ProcessPoolExecutor(processes) as pool:
+            while True:
+                batch = list(posts.filter(pk__gt=last_pk)[:batch_size])
+                if not batch:
+                    break
+                names = [name for _, name, *_ in batch]
+                results = pool.map(images.try_generate_variants, names)
+                ready = []
+                for (pk, name, old, category_id, author_id), variants in zip(
+                    batch, results
+                ):
+                    if not variants:
+                        # Прежние варианты остаются рабочими.
+                        failed += 1
+                        continue
+                    # Фото могли заменить, пока готовились варианты.
+                    if touch_cards(
+                        Post.objects.filter(pk=pk, image=name),
+                        image_variants=variants,
+                    ):
+                        # При адресации по содержимому совпавшие с новыми
+                        # файлы лишь теряют ссылку.
+                        images.delete_variants(old)
+                        ready.append((pk, category_id, author_id))
+                        done += 1
+                    else:
+                        images.delete_variants(variants)
+                if ready:
+                    post_ids, category_ids, author_ids = zip(*ready)
+                    bump_versions(*post_page_versions(
+                        post_ids, set(category_ids), set(author_ids)
+                    ))
+                last_pk = batch[-1][0]
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано фото: {done}, с ошибкой: {failed}'
+        ))
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from blog.models import Post
+from blog.signals import post_page_versions
+from core.cache import bump_versions
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет Post.excerpt и Post.text_html пачками по первичному '
+        'ключу. Нужна после смены правил анонса.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько публикаций обновлять в одной транзакции.'
+        )
+        parser.add_argument(
+            '--missing-only', action='store_true',
+            help='Только публикации, у которых анонса ещё нет.'
+        )
+
+    def handle(self, *args, batch_size, missing_only, **options):
+        posts = Post.objects.order_by('pk').only(
+            'pk', 'text', 'category_id', 'author_id'
+        )
+        if missing_only:
+            posts = posts.filter(excerpt='')
+        last_pk = 0
+        updated = 0
+        post_ids, category_ids, author_ids = set(), set(), set()
+        while True:
+            batch = list(posts.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            for post in batch:
+                post.render_text()
+                post.card_version = F('card_version') + 1
+            with transaction.atomic():
+                Post.objects.bulk_update(
+                    batch, ['excerpt', 'text_html', 'card_version']
+                )
+            last_pk = batch[-1].pk
+            updated += len(batch)
+            for post in batch:
+                post_ids.add(post.pk)
+                category_ids.add(post.category_id)
+                author_ids.add(post.author_id)
+        if updated:
+            # Фрагменты карточек устарели вместе с card_version, а страницы
+            # с анонсами — только в лентах этих публикаций.
+            bump_versions(
+                *post_page_versions(post_ids, category_ids, author_ids)
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f'Обновлено публикаций: {updated}')
+        )
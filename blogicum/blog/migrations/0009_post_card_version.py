@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-17 06:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='card_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False, help_text='Растёт при каждом изменении, видимом в карточке ленты.', verbose_name='Версия карточки'),
+        ),
+    ]
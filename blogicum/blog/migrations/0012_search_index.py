@@ -0,0 +1,54 @@
+from django.db import migrations
+
+TABLE = 'blog_search'
+BATCH_SIZE = 1000
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('blog', 'Post')
+    Comment = apps.get_model('blog', 'Comment')
+    insert = (
+        f'INSERT INTO {TABLE}(rowid, title, body, post_id) '
+        'VALUES (%s, %s, %s, %s)'
+    )
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE {TABLE} USING fts5('
+            'title, body, post_id UNINDEXED, '
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        cursor.execute(
+            f"INSERT INTO {TABLE}({TABLE}, rank) "
+            "VALUES ('rank', 'bm25(4.0, 1.0)')"
+        )
+        posts = Post.objects.order_by().values_list('pk', 'title', 'text')
+        cursor.executemany(insert, (
+            (pk * 2, title, text, pk)
+            for pk, title, text in posts.iterator(chunk_size=BATCH_SIZE)
+        ))
+        comments = Comment.objects.order_by().values_list(
+            'pk', 'text', 'post_id'
+        )
+        cursor.executemany(insert, (
+            (pk * 2 + 1, '', text, post_id)
+            for pk, text, post_id in comments.iterator(chunk_size=BATCH_SIZE)
+        ))
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0011_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-17 06:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Уменьшенные копии фото для srcset; пусто, пока их нет.', verbose_name='Варианты фото'),
+        ),
+    ]
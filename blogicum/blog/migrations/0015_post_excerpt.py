@@ -0,0 +1,46 @@
+# Generated by Django 3.2.16 on 2026-10-17 06:27
+
+from django.db import migrations, models
+from django.template.defaultfilters import linebreaksbr
+from django.utils.text import Truncator
+
+BATCH_SIZE = 500
+
+
+def render_text(apps, schema_editor):
+    # Как Post.render_text() на момент миграции: без анонса карточка
+    # осталась бы пустой.
+    Post = apps.get_model('blog', 'Post')
+    posts = Post.objects.order_by('pk').only('pk', 'text')
+    last_pk = 0
+    while True:
+        batch = list(posts.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not batch:
+            break
+        for post in batch:
+            excerpt = Truncator(post.text).words(10, truncate=' …')
+            post.excerpt = Truncator(excerpt).chars(512)
+            post.text_html = linebreaksbr(post.text)
+        Post.objects.bulk_update(batch, ['excerpt', 'text_html'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0014_image_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, help_text='Первые слова текста для карточки в ленте.', max_length=512, verbose_name='Анонс'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(blank=True, editable=False, help_text='Текст с переводами строк в <br>, уже экранированный.', verbose_name='Текст в HTML'),
+        ),
+        migrations.RunPython(render_text, migrations.RunPython.noop),
+    ]
@@ -1,13 +1,50 @@
-from django.db.models import Count
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.http import Http404
 from django.urls import reverse
-from django.utils import timezone
+from django.utils.http import urlencode
+
+from core.cache import CacheVersionsMixin, versioned_key
 
 from .forms import CommentForm
 from .models import Post, Comment
+from .pagination import KeysetPaginator, seek_page
+
+COMMENTS_ON_PAGE = 20
+
+
+def post_visibility(user):
+    """Какие публикации user может открыть по прямой ссылке."""
+    condition = Q(is_live=True, is_published=True,
+                  category__is_published=True)
+    if user.is_authenticated:
+        condition |= Q(author=user)
+    return condition
+
+
+class LookupCacheMixin:
+    """Объекты, найденные за время запроса, переиспользуются.
 
+    Экземпляр представления живёт один запрос, поэтому и кэш на нём:
+    test_func, get() и get_context_data получают один и тот же объект
+    без повторных запросов к базе.
+    """
 
-class CommentMixin:
+    def lookup(self, key, find):
+        lookups = self.__dict__.setdefault('_lookups', {})
+        if key not in lookups:
+            lookups[key] = find()
+        return lookups[key]
+
+    def get_object(self, queryset=None):
+        if queryset is not None:
+            return super().get_object(queryset)
+        return self.lookup('object', super().get_object)
+
+
+class CommentMixin(LookupCacheMixin):
     model = Comment
+    queryset = Comment.objects.select_related('author')
     form_class = CommentForm
     pk_url_kwarg = 'comment_id'
 
@@ -21,6 +58,31 @@ class CommentMixin:
         )
 
 
+class CommentPageMixin:
+    """Комментарии публикации порциями с курсором по (created_at, id).
+
+    Следующую порцию отдаёт blog:comments фрагментом HTML.
+    """
+
+    comments_on_page = COMMENTS_ON_PAGE
+
+    def get_comment_page(self, post, cursor=None):
+        try:
+            comments, next_cursor = seek_page(
+                Comment.objects.filter(post=post).select_related('author'),
+                cursor, self.comments_on_page,
+            )
+        except InvalidPage as error:
+            raise Http404(str(error))
+        next_url = None
+        if next_cursor is not None:
+            next_url = '{}?{}'.format(
+                reverse('blog:comments', kwargs={'post_id': post.pk}),
+                urlencode({'cursor': next_cursor}),
+            )
+        return {'comments': comments, 'comments_next_url': next_url}
+
+
 class PostMixin:
     model = Post
 
@@ -30,11 +92,46 @@ class PostMixin:
 
 
 class QuerySetMixin:
+    # Карточкам хватает анонса, полный текст из базы не читается.
+    deferred_fields = ('text', 'text_html')
+
     def get_queryset(self):
-        queryset = super().get_queryset().filter(
+        return super().get_queryset().filter(
             author__isnull=False,
-            pub_date__lte=timezone.now(),
+            is_live=True,
             is_published=True,
             category__is_published=True
+        ).select_related('author', 'category', 'location').defer(
+            *self.deferred_fields
         )
-        return queryset.annotate(comment_count=Count('comment'))
+
+
+class KeysetPaginationMixin(CacheVersionsMixin):
+    """Пагинация ленты: ?page=N для первых страниц, ?cursor= для глубоких."""
+
+    paginator_class = KeysetPaginator
+    cursor_kwarg = 'cursor'
+
+    def get_count_visibility(self):
+        """Часть ключа подсчёта, зависящая от того, кто смотрит ленту."""
+        return ''
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        # Версии те же, что у кэша страниц: они поднимаются при публикации
+        # и снятии с публикации.
+        kwargs.setdefault('count_cache_key', versioned_key(
+            'count:', self.current_versions,
+            type(self).__name__, self.get_count_visibility(),
+        ))
+        return super().get_paginator(queryset, per_page, **kwargs)
+
+    def paginate_queryset(self, queryset, page_size):
+        cursor = self.request.GET.get(self.cursor_kwarg)
+        if cursor is None:
+            return super().paginate_queryset(queryset, page_size)
+        paginator = self.get_paginator(queryset, page_size)
+        try:
+            page = paginator.cursor_page(cursor)
+        except InvalidPage as error:
+            raise Http404(str(error))
+        return paginator, page, page.object_list, page.has_other_pages()
@@ -1,10 +1,16 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
+from django.template.defaultfilters import linebreaksbr
+from django.utils import timezone
+from django.utils.text import Truncator
 
 from core.models import PublishedModel
 
 User = get_user_model()
 
+EXCERPT_WORDS = 10
+EXCERPT_LENGTH = 512
+
 
 class Category(PublishedModel):
     title = models.CharField(
@@ -18,6 +24,10 @@ class Category(PublishedModel):
         help_text='Идентификатор страницы для URL; разрешены символы '
                   'латиницы, цифры, дефис и подчёркивание.'
     )
+    updated_at = models.DateTimeField(
+        'Изменено',
+        auto_now=True
+    )
 
     def __str__(self):
         return self.title
@@ -32,6 +42,10 @@ class Location(PublishedModel):
         'Название места',
         max_length=256,
     )
+    updated_at = models.DateTimeField(
+        'Изменено',
+        auto_now=True
+    )
 
     def __str__(self):
         return self.name
@@ -72,15 +86,133 @@ class Post(PublishedModel):
         related_name='category_post'
     )
     image = models.ImageField('Фото', blank=True)
+    updated_at = models.DateTimeField(
+        'Изменено',
+        auto_now=True,
+        help_text='Обновляется и при изменении комментариев к публикации.'
+    )
+    comment_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False,
+    )
+    is_live = models.BooleanField(
+        'Вышла в ленту',
+        default=False,
+        editable=False,
+        help_text='Дата публикации наступила. Для отложенных публикаций '
+                  'флаг поднимает команда publish_scheduled.'
+    )
+    excerpt = models.CharField(
+        'Анонс',
+        max_length=EXCERPT_LENGTH,
+        blank=True,
+        editable=False,
+        help_text='Первые слова текста для карточки в ленте.'
+    )
+    text_html = models.TextField(
+        'Текст в HTML',
+        blank=True,
+        editable=False,
+        help_text='Текст с переводами строк в <br>, уже экранированный.'
+    )
+    image_variants = models.JSONField(
+        'Варианты фото',
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text='Уменьшенные копии фото для srcset; пусто, пока их нет.'
+    )
+    card_version = models.PositiveBigIntegerField(
+        'Версия карточки',
+        default=0,
+        editable=False,
+        help_text='Растёт при каждом изменении, видимом в карточке ленты.'
+    )
+
+    COUNTER_FIELDS = ('comment_count', 'card_version')
+    # Варианты фото пишут только сигналы и process_image_jobs.
+    BACKGROUND_FIELDS = ('image_variants',)
 
     class Meta:
         verbose_name = 'публикация'
         verbose_name_plural = 'Публикации'
         ordering = ['-pub_date', ]
+        # SQLite сравнивает булевы поля без "= 1", поэтому is_published
+        # в индекс не входит: он отфильтровывается при проходе по дате.
+        # Флаг is_live вынесен в условие частичных индексов — оно совпадает
+        # с условием запросов дословно, и планировщик их подхватывает.
+        indexes = [
+            models.Index(
+                fields=['pub_date', 'id'],
+                condition=models.Q(is_live=True),
+                name='post_live_feed_idx',
+            ),
+            models.Index(
+                fields=['pub_date'],
+                condition=models.Q(is_live=False),
+                name='post_scheduled_idx',
+            ),
+            models.Index(
+                fields=['category', 'pub_date', 'id'],
+                name='post_category_feed_idx',
+            ),
+            models.Index(
+                fields=['author', 'pub_date', 'id'],
+                name='post_author_feed_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    def render_text(self):
+        """Заполняет excerpt и text_html по text."""
+        excerpt = Truncator(self.text).words(EXCERPT_WORDS, truncate=' …')
+        self.excerpt = Truncator(excerpt).chars(EXCERPT_LENGTH)
+        self.text_html = linebreaksbr(self.text)
+
+    def save(self, *args, **kwargs):
+        self.is_live = self.pub_date <= timezone.now()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'text' in update_fields:
+            self.render_text()
+            if update_fields is not None:
+                update_fields = {*update_fields, 'excerpt', 'text_html'}
+        if update_fields is not None and 'pub_date' in update_fields:
+            update_fields = {*update_fields, 'is_live'}
+        if update_fields is not None:
+            kwargs['update_fields'] = update_fields
+        if self._state.adding or self.pk is None or kwargs.get(
+            'force_insert'
+        ):
+            return super().save(*args, **kwargs)
+        # Счётчики меняют только запросы UPDATE ... F(), а варианты фото —
+        # фоновая обработка: сохранение устаревшего экземпляра не должно
+        # их затирать. Версия карточки поднимается до сохранения, чтобы
+        # сигналы post_save видели настоящие значения из базы.
+        if update_fields is None:
+            update_fields = {
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+            }.difference(self.BACKGROUND_FIELDS)
+        posts = Post.objects.filter(pk=self.pk)
+        with transaction.atomic():
+            if not posts.update(card_version=models.F('card_version') + 1):
+                # Строки нет — Django вставит её, как при обычном save().
+                return super().save(*args, **kwargs)
+            (
+                self.card_version, self.comment_count, self.image_variants
+            ) = posts.values_list(
+                'card_version', 'comment_count', 'image_variants'
+            ).get()
+            super().save(*args, **{
+                **kwargs,
+                'update_fields': set(update_fields).difference(
+                    self.COUNTER_FIELDS
+                ),
+            })
+
 
 class Comment(PublishedModel):
     text = models.TextField('Введите текст комментария')
@@ -99,3 +231,72 @@ class Comment(PublishedModel):
 
     class Meta:
         ordering = ('created_at',)
+        indexes = [
+            # Порции комментариев листаются курсором по (created_at, id);
+            # id в индекс не входит: в SQLite строка индекса и так
+            # заканчивается rowid.
+            models.Index(
+                fields=['post', 'created_at'],
+                name='comment_post_created_idx',
+            ),
+        ]
+
+
+class ImageJob(models.Model):
+    """Задание очереди на подготовку вариантов фото публикации.
+
+    На публикацию приходится не больше одного задания: новая загрузка
+    фото перезаписывает ещё не выполненное. Выполненные задания удаляются,
+    в таблице остаются только ожидающие и окончательно упавшие.
+    """
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Ожидает'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Ошибка'),
+    )
+
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='image_job',
+        verbose_name='Публикация'
+    )
+    image = models.CharField('Файл фото', max_length=255)
+    status = models.CharField(
+        'Состояние',
+        max_length=16,
+        choices=STATUSES,
+        default=PENDING
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    run_after = models.DateTimeField(
+        'Не раньше',
+        default=timezone.now,
+        help_text='Для выполняющегося задания — срок, после которого '
+                  'его заберёт другой обработчик.'
+    )
+    claimed_by = models.CharField(
+        'Обработчик',
+        max_length=32,
+        blank=True,
+        editable=False
+    )
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created_at = models.DateTimeField('Добавлено', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'задание обработки фото'
+        verbose_name_plural = 'Задания обработки фото'
+        indexes = [
+            models.Index(
+                fields=['status', 'run_after'],
+                name='image_job_due_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.image} ({self.get_status_display()})'
@@ -0,0 +1,271 @@
+import base64
+import binascii
+from collections.abc import Sequence
+
+from django.core.cache import cache
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+# Глубже этой страницы ?page= не обслуживается — дальше только курсоры.
+MAX_OFFSET_PAGES = 20
+# Подсчёт сбрасывается версиями страниц: их поднимают сигналы моделей,
+# а для отложенных публикаций — publish_scheduled. Срок — лишь страховка
+# от изменений в обход обоих, например QuerySet.update().
+COUNT_CACHE_TIMEOUT = 60 * 10
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(direction, key=None):
+    """Упаковывает направление и ключ (дата, id) в непрозрачную строку."""
+    raw = direction
+    if key is not None:
+        pub_date, pk = key
+        raw = f'{direction}|{pub_date.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Обратная операция к encode_cursor; InvalidPage для мусора."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+    except (binascii.Error, UnicodeError, ValueError):
+        raise InvalidPage('Некорректный курсор.')
+    direction, _, rest = raw.partition('|')
+    if direction not in (NEXT, PREVIOUS):
+        raise InvalidPage('Некорректный курсор.')
+    if not rest:
+        return direction, None
+    pub_date, _, pk = rest.rpartition('|')
+    try:
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except ValueError:
+        pub_date = None
+    if pub_date is None:
+        raise InvalidPage('Некорректный курсор.')
+    return direction, (pub_date, pk)
+
+
+class _CursorLinksMixin:
+    """Общие для обоих видов страниц ссылки на соседние страницы."""
+
+    def _cursor_query(self, direction, obj=None):
+        key = None if obj is None else self.paginator.get_key(obj)
+        return f'cursor={encode_cursor(direction, key)}'
+
+    @property
+    def last_query(self):
+        paginator = self.paginator
+        if paginator.num_pages <= paginator.max_offset_pages:
+            return f'page={paginator.num_pages}'
+        return self._cursor_query(PREVIOUS)
+
+
+class NumberedPage(Page):
+    """Страница ?page=N со ссылками для includes/paginator.html."""
+
+    @property
+    def linked_page_range(self):
+        return self.paginator.page_range
+
+    @property
+    def previous_query(self):
+        return f'page={self.previous_page_number()}'
+
+    @property
+    def next_query(self):
+        return f'page={self.next_page_number()}'
+
+    @property
+    def last_query(self):
+        return f'page={self.paginator.num_pages}'
+
+
+class NumberedPaginator(Paginator):
+    def _get_page(self, *args, **kwargs):
+        return NumberedPage(*args, **kwargs)
+
+
+class KeysetPage(_CursorLinksMixin, NumberedPage):
+    """Обычная страница ?page=N, умеющая переходить в режим курсоров."""
+
+    @property
+    def linked_page_range(self):
+        return range(
+            1, min(self.paginator.num_pages,
+                   self.paginator.max_offset_pages) + 1
+        )
+
+    @property
+    def next_query(self):
+        # next_page_number() отверг бы номер за пределом max_offset_pages.
+        number = self.number + 1
+        if number <= self.paginator.max_offset_pages:
+            return f'page={number}'
+        return self._cursor_query(NEXT, self[-1])
+
+
+class CursorPage(_CursorLinksMixin, Sequence):
+    """Страница, полученная поиском по индексу от курсора, без OFFSET."""
+
+    number = None
+    linked_page_range = range(0)
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def previous_query(self):
+        return self._cursor_query(PREVIOUS, self.object_list[0])
+
+    @property
+    def next_query(self):
+        return self._cursor_query(NEXT, self.object_list[-1])
+
+    @property
+    def last_query(self):
+        return self._cursor_query(PREVIOUS)
+
+
+class KeysetPaginator(Paginator):
+    """Пагинатор по ключу (pub_date, id).
+
+    Первые max_offset_pages страниц доступны по старым адресам ?page=N,
+    всё, что глубже, отдаётся через непрозрачный курсор ?cursor=.
+
+    COUNT(*) считается не дальше последней страницы, доступной по номеру:
+    за этой границей точное число ни на что не влияет, и count становится
+    оценкой снизу. С count_cache_key результат ещё и кэшируется.
+    """
+
+    max_offset_pages = MAX_OFFSET_PAGES
+    ordering = ('-pub_date', '-id')
+    estimate_counts = True
+
+    def __init__(self, *args, count_cache_key=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.count_cache_key = count_cache_key
+
+    @cached_property
+    def count_limit(self):
+        if not self.estimate_counts:
+            return None
+        return self.max_offset_pages * self.per_page + 1
+
+    @cached_property
+    def count(self):
+        if self.count_cache_key is not None:
+            count = cache.get(self.count_cache_key)
+            if count is not None:
+                return count
+        queryset = self.object_list
+        if self.count_limit is not None:
+            queryset = queryset.order_by()[:self.count_limit]
+        count = queryset.count()
+        if self.count_cache_key is not None:
+            cache.set(self.count_cache_key, count, COUNT_CACHE_TIMEOUT)
+        return count
+
+    def validate_number(self, number):
+        if str(number).isdigit() and int(number) > self.max_offset_pages:
+            raise InvalidPage('Слишком глубокая страница, используйте курсор.')
+        return super().validate_number(number)
+
+    def _get_page(self, *args, **kwargs):
+        return KeysetPage(*args, **kwargs)
+
+    @staticmethod
+    def get_key(obj):
+        return obj.pub_date, obj.pk
+
+    def cursor_page(self, cursor):
+        direction, key = decode_cursor(cursor)
+        page = self._seek(direction, key)
+        if key is not None and not page:
+            raise InvalidPage('За курсором нет публикаций.')
+        return page
+
+    def seek_queryset(self, direction, key=None):
+        """Упорядоченная выборка строк строго после (или до) ключа."""
+        # Лишнее на вид условие pub_date <=/>= даёт SQLite границу для
+        # поиска по индексу: по одному OR он умеет только сканировать.
+        queryset = self.object_list
+        ordering = self.ordering
+        if direction == NEXT:
+            if key is not None:
+                pub_date, pk = key
+                queryset = queryset.filter(
+                    Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk),
+                    pub_date__lte=pub_date,
+                )
+        else:
+            if key is not None:
+                pub_date, pk = key
+                queryset = queryset.filter(
+                    Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, pk__gt=pk),
+                    pub_date__gte=pub_date,
+                )
+            ordering = [field.lstrip('-') for field in ordering]
+        return queryset.order_by(*ordering)
+
+    def _seek(self, direction, key):
+        rows = list(
+            self.seek_queryset(direction, key)[:self.per_page + 1]
+        )
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == NEXT:
+            return CursorPage(rows, self, has_more, key is not None)
+        return CursorPage(rows[::-1], self, key is not None, has_more)
+
+
+def seek_page(queryset, cursor, per_page, date_field='created_at'):
+    """Порция строк по возрастанию (date_field, id) после курсора.
+
+    Возвращает строки и курсор следующей порции — None, если это
+    последняя. Некорректный курсор даёт InvalidPage.
+    """
+    if cursor is not None:
+        direction, key = decode_cursor(cursor)
+        if direction != NEXT or key is None:
+            raise InvalidPage('Некорректный курсор.')
+        date, pk = key
+        # Граница по дате, как и в KeysetPaginator, нужна для индекса.
+        queryset = queryset.filter(
+            Q(**{f'{date_field}__gt': date})
+            | Q(**{date_field: date, 'pk__gt': pk}),
+            **{f'{date_field}__gte': date},
+        )
+    rows = list(queryset.order_by(date_field, 'pk')[:per_page + 1])
+    if len(rows) <= per_page:
+        return rows, None
+    last = rows[per_page - 1]
+    return rows[:per_page], encode_cursor(
+        NEXT, (getattr(last, date_field), last.pk)
+    )
@@ -0,0 +1,32 @@
+from django.db import transaction
+from django.utils import timezone
+
+from core.cache import bump_versions
+
+from .models import Post
+from .signals import post_page_versions
+
+
+def publish_due_posts(batch_size=500):
+    """Выпускает в ленту публикации, чья дата наступила.
+
+    Флаг поднимается пачками одним UPDATE, после каждой пачки сбрасываются
+    версии затронутых страниц. Возвращает число выпущенных публикаций.
+    """
+    now = timezone.now()
+    published = 0
+    while True:
+        with transaction.atomic():
+            due = list(
+                Post.objects.filter(is_live=False, pub_date__lte=now)
+                .order_by('pub_date')
+                .values_list('pk', 'category_id', 'author_id')[:batch_size]
+            )
+            if not due:
+                return published
+            post_ids, category_ids, author_ids = zip(*due)
+            Post.objects.filter(pk__in=post_ids).update(is_live=True)
+        bump_versions(*post_page_versions(
+            post_ids, set(category_ids), set(author_ids)
+        ))
+        published += len(due)
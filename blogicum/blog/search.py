@@ -0,0 +1,112 @@
+"""Полнотекстовый поиск по публикациям и комментариям на SQLite FTS5.
+
+Индекс — виртуальная таблица blog_search: одна строка на публикацию
+(заголовок и текст) и по строке на комментарий. rowid строки выводится
+из первичного ключа, поэтому переиндексация — один INSERT OR REPLACE.
+Таблицу создаёт миграция 0012; там же задан ранг bm25, в котором
+совпадение в заголовке весит вчетверо больше совпадения в тексте.
+Видимость публикаций в индексе не хранится: поиск принимает QuerySet
+видимых публикаций и проверяет её в том же запросе, до LIMIT.
+
+На других СУБД индекс не ведётся, а поиск ничего не находит.
+"""
+import re
+
+from django.db import connection
+
+TABLE = 'blog_search'
+# Сколько лучших совпадений вообще рассматривается для выдачи.
+RESULTS_LIMIT = 500
+MAX_TERMS = 8
+
+UPSERT_SQL = (
+    f'INSERT OR REPLACE INTO {TABLE}(rowid, title, body, post_id) '
+    'VALUES (%s, %s, %s, %s)'
+)
+DELETE_SQL = f'DELETE FROM {TABLE} WHERE rowid = %s'
+SEARCH_SQL = (
+    f'SELECT post_id FROM {TABLE} WHERE {TABLE} MATCH %s{{posts}} '
+    'GROUP BY post_id ORDER BY min(rank) LIMIT %s'
+)
+
+WORD = re.compile(r'\w+')
+
+
+def is_supported(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def post_rowid(pk):
+    return pk * 2
+
+
+def comment_rowid(pk):
+    return pk * 2 + 1
+
+
+def post_row(pk, title, text):
+    return post_rowid(pk), title, text, pk
+
+
+def comment_row(pk, text, post_id):
+    return comment_rowid(pk), '', text, post_id
+
+
+def write_rows(rows):
+    if is_supported():
+        with connection.cursor() as cursor:
+            cursor.executemany(UPSERT_SQL, rows)
+
+
+def delete_rows(rowids):
+    if is_supported():
+        with connection.cursor() as cursor:
+            cursor.executemany(DELETE_SQL, [(rowid,) for rowid in rowids])
+
+
+def clear():
+    if is_supported():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE}')
+
+
+def optimize():
+    """Сливает сегменты индекса после массовой загрузки."""
+    if is_supported():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {TABLE}({TABLE}) VALUES ('optimize')"
+            )
+
+
+def match_expression(query):
+    """Запрос пользователя в выражение FTS5: все слова, каждое — префикс.
+
+    Слова берутся в кавычки, так что операторы и спецсимволы FTS5 из
+    пользовательского ввода не интерпретируются.
+    """
+    terms = WORD.findall(query)[:MAX_TERMS]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_post_ids(query, posts=None, limit=None):
+    """id публикаций, где найден запрос, от лучших совпадений к худшим.
+
+    Совпадения в комментариях поднимают их публикацию. posts — QuerySet
+    публикаций, среди которых ищем; без него — среди всех.
+    """
+    expression = match_expression(query)
+    if not expression or not is_supported():
+        return []
+    condition, params = '', []
+    if posts is not None:
+        subquery, params = (
+            posts.order_by().values('pk').query.sql_with_params()
+        )
+        condition = f' AND post_id IN ({subquery})'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            SEARCH_SQL.format(posts=condition),
+            [expression, *params, limit or RESULTS_LIMIT],
+        )
+        return [pk for pk, in cursor.fetchall()]
@@ -0,0 +1,374 @@
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import (
+    post_delete, post_init, post_save, pre_save
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.cache import bump_versions
+from core.metrics import REGISTRY
+from core.storage import is_content_addressed
+
+from . import images, jobs, search
+from .models import Category, Comment, Location, Post, User
+
+TOUCH_BATCH_SIZE = 500
+
+
+def touch_cards(posts, **changes):
+    """Поднимает версию карточки: её фрагмент в кэше станет неактуален.
+
+    Возвращает число изменённых публикаций.
+    """
+    return posts.update(
+        card_version=F('card_version') + 1,
+        updated_at=timezone.now(),
+        **changes
+    )
+
+
+def touch_all_cards(posts, batch_size=TOUCH_BATCH_SIZE):
+    """touch_cards пачками по первичному ключу.
+
+    В категории или у автора могут быть тысячи публикаций; одно UPDATE
+    по всем сразу надолго заняло бы запись в базу.
+    """
+    posts = posts.order_by('pk').values_list('pk', flat=True)
+    last_pk = 0
+    while True:
+        pks = list(posts.filter(pk__gt=last_pk)[:batch_size])
+        if not pks:
+            break
+        touch_cards(Post.objects.filter(pk__in=pks))
+        last_pk = pks[-1]
+
+
+def _shift_comment_count(post_id, delta):
+    if post_id is not None:
+        touch_cards(
+            Post.objects.filter(pk=post_id),
+            comment_count=F('comment_count') + delta
+        )
+
+
+def recount_comments(posts):
+    """Пересчитывает comment_count публикаций posts по комментариям."""
+    comments = (
+        Comment.objects.filter(post=OuterRef('pk'))
+        .order_by()
+        .values('post')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return posts.update(comment_count=Coalesce(Subquery(comments), 0))
+
+
+@receiver(post_init, sender=Comment)
+def remember_comment_post(sender, instance, **kwargs):
+    # Без обращения к атрибуту: отложенное поле вызвало бы лишний запрос.
+    instance._counted_post_id = instance.__dict__.get('post_id')
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        # loaddata пишет строки как есть, и created у них не отличить от
+        # перезаписи: счётчик проще пересчитать.
+        recount_comments(Post.objects.filter(pk=instance.post_id))
+        return
+    if created:
+        _shift_comment_count(instance.post_id, 1)
+    elif instance._counted_post_id not in (None, instance.post_id):
+        # Комментарий перенесли к другой публикации (например, в админке).
+        _shift_comment_count(instance._counted_post_id, -1)
+        _shift_comment_count(instance.post_id, 1)
+    instance._counted_post_id = instance.post_id
+
+
+@receiver(post_save, sender=Post)
+def count_loaded_comments(sender, instance, raw=False, **kwargs):
+    # В фикстуре комментарии могут идти раньше своей публикации.
+    if raw:
+        recount_comments(Post.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    _shift_comment_count(instance._counted_post_id or instance.post_id, -1)
+
+
+@receiver(post_init, sender=Post)
+def remember_post_image(sender, instance, **kwargs):
+    instance._cached_image = str(instance.__dict__.get('image') or '')
+
+
+@receiver(pre_save, sender=Post)
+def remember_image_upload(sender, instance, **kwargs):
+    # Новый файл ещё не сохранён: хранилище добавит на него ссылку.
+    file = instance.__dict__.get('image')
+    instance._image_uploaded = isinstance(file, File) and bool(file) and (
+        not getattr(file, '_committed', False)
+    )
+
+
+@receiver(post_save, sender=Post)
+def refresh_image_variants(sender, instance, created, raw=False, **kwargs):
+    # Раньше сброса кэша страниц: они не должны ссылаться на старые
+    # варианты.
+    if raw:
+        return
+    name = instance.image.name or ''
+    if not created and name == instance._cached_image:
+        if instance._image_uploaded:
+            # То же фото загрузили заново: имя по содержимому не
+            # изменилось, а лишняя ссылка осталась.
+            _release_image(instance.image.storage, name)
+        return
+    if not name and created:
+        return
+    # Варианты готовит process_image_jobs; до тех пор шаблоны
+    # показывают оригинал.
+    if instance.image_variants:
+        _release_variants(instance.image_variants)
+        touch_cards(Post.objects.filter(pk=instance.pk), image_variants={})
+        instance.image_variants = {}
+    if name:
+        jobs.enqueue(instance.pk, name)
+    else:
+        jobs.cancel(instance.pk)
+    _release_image(instance.image.storage, instance._cached_image)
+    instance._cached_image = name
+
+
+@receiver(post_delete, sender=Post)
+def delete_image_files(sender, instance, **kwargs):
+    _release_variants(instance.image_variants)
+    _release_image(instance.image.storage, instance._cached_image)
+
+
+def _release_variants(variants):
+    # После фиксации: при откате строка снова ссылается на эти файлы.
+    if variants:
+        transaction.on_commit(lambda: images.delete_variants(variants))
+
+
+def _release_image(storage, name):
+    """Снимает ссылку публикации на прежнее фото после фиксации.
+
+    Файлы, сохранённые до адресации по содержимому, могли делить
+    несколько публикаций без учёта ссылок, и они не удаляются.
+    """
+    if name and is_content_addressed(name):
+        transaction.on_commit(lambda: storage.delete(name))
+
+
+# Сброс кэша страниц для анонимов. Имена версий совпадают с теми, что
+# перечисляют представления в get_cache_versions.
+
+def _listing_versions(posts):
+    """Ленты категорий и профилей, где видны публикации из posts."""
+    names = set()
+    for slug, username in posts.order_by().values_list(
+        'category__slug', 'author__username'
+    ).distinct():
+        if slug is not None:
+            names.add(f'category:{slug}')
+        if username is not None:
+            names.add(f'author:{username}')
+    return names
+
+
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=Category)
+@receiver(pre_save, sender=Location)
+def fill_loaded_updated_at(sender, instance, raw=False, **kwargs):
+    # loaddata не вызывает auto_now, а в старых фикстурах поля нет.
+    if raw and instance.updated_at is None:
+        instance.updated_at = timezone.now()
+
+
+@receiver(pre_save, sender=Post)
+def fill_loaded_is_live(sender, instance, raw=False, **kwargs):
+    # loaddata минует Post.save(), а флаг в фикстуре мог устареть.
+    # QuerySet.update() и bulk_create() флаг не пересчитывают: наступившие
+    # даты подхватит publish_scheduled.
+    if raw:
+        instance.is_live = instance.pub_date <= timezone.now()
+
+
+@receiver(pre_save, sender=Post)
+def fill_loaded_text(sender, instance, raw=False, **kwargs):
+    # Анонс и HTML в фикстуре могли устареть или отсутствовать, а карточка
+    # текст не загружает.
+    if raw:
+        instance.render_text()
+
+
+def _changed_at(instance, signal):
+    """updated_at сохранённой строки; для удаления — текущий момент."""
+    return instance.updated_at if signal is post_save else None
+
+
+def post_page_versions(post_ids, category_ids, author_ids):
+    names = {'feed', *(f'post:{pk}' for pk in post_ids)}
+    names.update(
+        f'category:{slug}' for slug in Category.objects.filter(
+            pk__in=[pk for pk in category_ids if pk is not None]
+        ).values_list('slug', flat=True)
+    )
+    names.update(
+        f'author:{username}' for username in User.objects.filter(
+            pk__in=[pk for pk in author_ids if pk is not None]
+        ).values_list('username', flat=True)
+    )
+    return names
+
+
+@receiver(post_init, sender=Post)
+def remember_post_listings(sender, instance, **kwargs):
+    instance._cached_listing = (
+        instance.__dict__.get('category_id'),
+        instance.__dict__.get('author_id'),
+    )
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, signal, raw=False, **kwargs):
+    if raw:
+        return
+    old_category_id, old_author_id = instance._cached_listing
+    bump_versions(
+        *post_page_versions(
+            [instance.pk],
+            {old_category_id, instance.category_id},
+            {old_author_id, instance.author_id},
+        ),
+        at=_changed_at(instance, signal),
+    )
+    instance._cached_listing = (instance.category_id, instance.author_id)
+
+
+@receiver(post_init, sender=Comment)
+def remember_comment_page(sender, instance, **kwargs):
+    instance._cached_post_id = instance.__dict__.get('post_id')
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_pages(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Счётчик комментариев виден на карточках во всех лентах.
+    post_ids = {instance.post_id, instance._cached_post_id} - {None}
+    bump_versions(
+        'feed',
+        *(f'post:{pk}' for pk in post_ids),
+        *_listing_versions(Post.objects.filter(pk__in=post_ids)),
+    )
+    instance._cached_post_id = instance.post_id
+
+
+@receiver(post_init, sender=Category)
+def remember_category_slug(sender, instance, **kwargs):
+    instance._cached_slug = instance.__dict__.get('slug')
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_pages(sender, instance, signal, raw=False,
+                              **kwargs):
+    if raw:
+        return
+    slugs = {instance._cached_slug, instance.slug} - {None}
+    touch_all_cards(Post.objects.filter(category=instance.pk))
+    bump_versions(
+        'feed', 'details',
+        *(f'category:{slug}' for slug in slugs),
+        *_listing_versions(Post.objects.filter(category=instance.pk)),
+        at=_changed_at(instance, signal),
+    )
+    instance._cached_slug = instance.slug
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def invalidate_location_pages(sender, instance, signal, raw=False,
+                              **kwargs):
+    if raw:
+        return
+    touch_all_cards(Post.objects.filter(location=instance.pk))
+    bump_versions(
+        'feed', 'details',
+        *_listing_versions(Post.objects.filter(location=instance.pk)),
+        at=_changed_at(instance, signal),
+    )
+
+
+@receiver(post_init, sender=User)
+def remember_username(sender, instance, **kwargs):
+    instance._cached_username = instance.__dict__.get('username')
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_pages(sender, instance, raw=False, update_fields=None,
+                          **kwargs):
+    # Вход в систему обновляет только last_login — страницы не меняются.
+    if raw or update_fields == frozenset({'last_login'}):
+        return
+    usernames = {instance._cached_username, instance.username} - {None}
+    names = {f'author:{username}' for username in usernames}
+    posts = Post.objects.filter(author=instance.pk)
+    if len(usernames) > 1:
+        touch_all_cards(posts)
+    if posts.exists() or Comment.objects.filter(author=instance.pk).exists():
+        names.update({'feed', 'details', *_listing_versions(posts)})
+    bump_versions(*names)
+    instance._cached_username = instance.username
+
+
+# Поисковый индекс обновляется построчно вместе с сохранением.
+
+def _indexes(update_fields, *fields):
+    return update_fields is None or not update_fields.isdisjoint(fields)
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, raw=False, update_fields=None,
+                     **kwargs):
+    if not raw and _indexes(update_fields, 'title', 'text'):
+        search.write_rows(
+            [search.post_row(instance.pk, instance.title, instance.text)]
+        )
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    # Строки комментариев удаляются сигналами каскадного удаления.
+    search.delete_rows([search.post_rowid(instance.pk)])
+
+
+@receiver(post_save, sender=Comment)
+def index_saved_comment(sender, instance, raw=False, update_fields=None,
+                        **kwargs):
+    if not raw and _indexes(update_fields, 'text', 'post', 'post_id'):
+        search.write_rows([search.comment_row(
+            instance.pk, instance.text, instance.post_id
+        )])
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_deleted_comment(sender, instance, **kwargs):
+    search.delete_rows([search.comment_rowid(instance.pk)])
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+def count_created(sender, instance, created, raw=False, **kwargs):
+    # Счётчики blogicum_posts_created_total и ..._comments_created_total.
+    if created and not raw:
+        REGISTRY.increment(f'{sender._meta.model_name}s_created')
@@ -0,0 +1,44 @@
+from django import template
+
+register = template.Library()
+
+# Карточка и страница публикации не шире 40rem.
+SIZES = '(max-width: 40rem) 100vw, 40rem'
+
+
+def _srcset(storage, variants, key):
+    entries = {
+        entry['width']: entry[key] for entry in variants.values()
+        if key in entry
+    }
+    return ', '.join(
+        f'{storage.url(name)} {width}w'
+        for width, name in sorted(entries.items())
+    )
+
+
+@register.inclusion_tag('includes/post_image.html')
+def post_image(post, variant, lazy=True):
+    """Фото публикации с srcset из вариантов; без них — оригинал."""
+    image = post.image
+    storage = image.storage
+    variants = post.image_variants
+    context = {
+        'alt': post.title,
+        'loading': 'lazy' if lazy else 'eager',
+        'sizes': SIZES,
+        'src': image.url,
+        'href': image.url,
+    }
+    if variant in variants:
+        entry = variants[variant]
+        context.update(
+            src=storage.url(entry['name']),
+            width=entry['width'],
+            height=entry['height'],
+            srcset=_srcset(storage, variants, 'name'),
+            webp_srcset=_srcset(storage, variants, 'webp'),
+        )
+        if 'full' in variants:
+            context['href'] = storage.url(variants['full']['name'])
+    return context
@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import feeds, views
 
 app_name = 'blog'
 
@@ -21,6 +21,11 @@ urlpatterns = [
         views.PostDeleteView.as_view(),
         name='delete_post'
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.CommentListView.as_view(),
+        name='comments'
+    ),
     path(
         'posts/<int:post_id>/comment',
         views.CommentCreateView.as_view(),
@@ -53,4 +58,20 @@ urlpatterns = [
         views.ProfileListView.as_view(),
         name='profile'
     ),
+    path('search/', views.SearchView.as_view(), name='search'),
+    path(
+        'feeds/<slug:feed_format>/',
+        feeds.PostFeedView.as_view(),
+        name='feed'
+    ),
+    path(
+        'category/<slug:category_slug>/feeds/<slug:feed_format>/',
+        feeds.CategoryFeedView.as_view(),
+        name='category_feed'
+    ),
+    path(
+        'profile/<slug:username>/feeds/<slug:feed_format>/',
+        feeds.ProfileFeedView.as_view(),
+        name='profile_feed'
+    ),
 ]
@@ -1,24 +1,36 @@
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.db.models import Count, Q
+from django.db.models import Q
 from django.http import HttpResponseRedirect
 from django.shortcuts import get_object_or_404
 from django.urls import reverse_lazy, reverse
-from django.utils import timezone
+from django.utils.http import urlencode
 from django.views.generic import (
     ListView, CreateView, UpdateView, DeleteView, DetailView
 )
 
+from core.cache import AnonymousPageCacheMixin, ConditionalGetMixin
+
 from .forms import PostForm, CommentForm, ProfileChangeForm
-from .mixins import CommentMixin, QuerySetMixin
+from .mixins import (
+    CommentMixin, CommentPageMixin, KeysetPaginationMixin, LookupCacheMixin,
+    QuerySetMixin, post_visibility
+)
 from .models import Post, Category, User
+from .pagination import NumberedPaginator
+from .search import search_post_ids
 
 POSTS_ON_PAGE = 10
 
+# У каждого представления query_budget — предельное число SQL-запросов
+# на один запрос анонима или автора, в том числе повторный, из кэша;
+# соблюдение проверяет tests/test_query_budget.py.
+
 
 class ProfileEditView(LoginRequiredMixin, UpdateView):
     model = User
     form_class = ProfileChangeForm
     template_name = 'blog/user.html'
+    query_budget = 2
 
     def form_valid(self, form):
         form.instance.author = self.request.user
@@ -32,20 +44,42 @@ class ProfileEditView(LoginRequiredMixin, UpdateView):
         return reverse('blog:profile', kwargs={'username': slug})
 
 
-class ProfileListView(ListView):
+class ProfileListView(
+        ConditionalGetMixin, AnonymousPageCacheMixin, KeysetPaginationMixin,
+        LookupCacheMixin, ListView
+):
     model = Post
     template_name = 'blog/profile.html'
     slug_url_kwarg = 'username'
     slug_field = 'username'
     paginate_by = POSTS_ON_PAGE
-    ordering = ['-pub_date']
+    ordering = ['-pub_date', '-id']
+    query_budget = 5
 
-    def get_queryset(self):
-        user = get_object_or_404(
+    def get_cache_versions(self):
+        return [f'author:{self.kwargs[self.slug_url_kwarg]}']
+
+    def get_count_visibility(self):
+        is_owner = (
+            self.request.user.get_username()
+            == self.kwargs[self.slug_url_kwarg]
+        )
+        return 'owner' if is_owner else 'public'
+
+    @property
+    def profile(self):
+        return self.lookup('profile', lambda: get_object_or_404(
             User,
             username=self.kwargs.get(self.slug_url_kwarg)
+        ))
+
+    def get_queryset(self):
+        user = self.profile
+        queryset = super().get_queryset().filter(
+            author=user
+        ).select_related('author', 'category', 'location').defer(
+            'text', 'text_html'
         )
-        queryset = super().get_queryset().filter(author=user)
         if self.request.user != user:
             queryset = queryset.filter(
                 category__is_published=True,
@@ -57,21 +91,21 @@ class ProfileListView(ListView):
                 | Q(category__isnull=True)
                 | Q(category__is_published=False)
             )
-        return queryset.annotate(comment_count=Count('comment'))
+        return queryset
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['profile'] = get_object_or_404(
-            User,
-            username=self.kwargs.get(self.slug_url_kwarg))
+        context['profile'] = self.profile
         return context
 
 
-class PostUpdateView(UserPassesTestMixin, UpdateView):
+class PostUpdateView(UserPassesTestMixin, LookupCacheMixin, UpdateView):
     model = Post
+    queryset = Post.objects.select_related('author', 'category', 'location')
     form_class = PostForm
     template_name = 'blog/create.html'
     pk_url_kwarg = 'post_id'
+    query_budget = 5
 
     def form_valid(self, form):
         form.instance.author = self.request.user
@@ -91,11 +125,13 @@ class PostUpdateView(UserPassesTestMixin, UpdateView):
         return reverse('blog:post_detail', kwargs={'post_id': self.object.pk})
 
 
-class PostDeleteView(UserPassesTestMixin, DeleteView):
+class PostDeleteView(UserPassesTestMixin, LookupCacheMixin, DeleteView):
     model = Post
+    queryset = Post.objects.select_related('author', 'category', 'location')
     template_name = 'blog/detail.html'
     pk_url_kwarg = 'post_id'
     success_url = reverse_lazy('blog:index')
+    query_budget = 5
 
     def form_valid(self, form):
         form.instance.author = self.request.user
@@ -122,6 +158,7 @@ class PostCreateView(LoginRequiredMixin, CreateView):
     model = Post
     form_class = PostForm
     template_name = 'blog/create.html'
+    query_budget = 4
 
     def form_valid(self, form):
         form.instance.author = self.request.user
@@ -133,47 +170,85 @@ class PostCreateView(LoginRequiredMixin, CreateView):
         )
 
 
-class PostDetailView(DetailView):
+class PostDetailView(
+        ConditionalGetMixin, AnonymousPageCacheMixin, CommentPageMixin,
+        DetailView
+):
     model = Post
     template_name = 'blog/detail.html'
     pk_url_kwarg = 'post_id'
+    query_budget = 4
+
+    def get_cache_versions(self):
+        return [f'post:{self.kwargs[self.pk_url_kwarg]}', 'details']
 
     def get_object(self, queryset=None):
-        base_query = Post.objects.filter(pk=self.kwargs['post_id'])
-        if self.request.user.is_authenticated:
-            condition = Q(author=self.request.user) | (
-                Q(pub_date__lte=timezone.now())
-                & Q(is_published=True)
-                & Q(category__is_published=True)
-            )
-        else:
-            condition = (
-                Q(pub_date__lte=timezone.now())
-                & Q(is_published=True)
-                & Q(category__is_published=True)
-            )
-        return get_object_or_404(base_query.filter(condition))
+        base_query = Post.objects.filter(
+            pk=self.kwargs['post_id']
+        ).select_related('author', 'category', 'location')
+        return get_object_or_404(
+            base_query.filter(post_visibility(self.request.user))
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['form'] = CommentForm()
-        context['comments'] = self.object.comment.all()
+        context.update(self.get_comment_page(self.object))
+        return context
+
+
+class CommentListView(
+        ConditionalGetMixin, AnonymousPageCacheMixin, CommentPageMixin,
+        DetailView
+):
+    """Фрагмент со следующей порцией комментариев для «Показать ещё»."""
+
+    model = Post
+    template_name = 'includes/comment_list.html'
+    pk_url_kwarg = 'post_id'
+    query_budget = 4
+
+    def get_cache_versions(self):
+        return [f'post:{self.kwargs[self.pk_url_kwarg]}', 'details']
+
+    def get_object(self, queryset=None):
+        return get_object_or_404(
+            Post.objects.filter(post_visibility(self.request.user))
+            .only('pk'),
+            pk=self.kwargs['post_id'],
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(self.get_comment_page(
+            self.object, self.request.GET.get('cursor')
+        ))
         return context
 
 
-class PostListView(QuerySetMixin, ListView):
+class PostListView(
+        ConditionalGetMixin, AnonymousPageCacheMixin, KeysetPaginationMixin,
+        QuerySetMixin, ListView
+):
     model = Post
-    ordering = ['-pub_date']
+    ordering = ['-pub_date', '-id']
     paginate_by = POSTS_ON_PAGE
     template_name = 'blog/index.html'
+    query_budget = 4
+
+    def get_cache_versions(self):
+        return ['feed']
 
 
 class CommentCreateView(LoginRequiredMixin, CommentMixin, CreateView):
     template_name = 'blog/comment.html'
     pk_url_kwarg = 'post_id'
+    query_budget = 7
 
     def get_object(self, queryset=None):
-        return get_object_or_404(Post, pk=self.kwargs['post_id'])
+        return self.lookup('post', lambda: get_object_or_404(
+            Post, pk=self.kwargs['post_id']
+        ))
 
     def form_valid(self, form):
         form.instance.author = self.request.user
@@ -183,6 +258,7 @@ class CommentCreateView(LoginRequiredMixin, CommentMixin, CreateView):
 
 class CommentUpdateView(UserPassesTestMixin, CommentMixin, UpdateView):
     template_name = 'blog/comment.html'
+    query_budget = 5
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -196,38 +272,82 @@ class CommentUpdateView(UserPassesTestMixin, CommentMixin, UpdateView):
 
 class CommentDeleteView(UserPassesTestMixin, CommentMixin, DeleteView):
     template_name = 'blog/comment.html'
+    query_budget = 3
 
     def test_func(self):
         comment = self.get_object()
         return self.request.user == comment.author
 
 
-class CategoryListView(QuerySetMixin, ListView):
+class CategoryListView(
+        ConditionalGetMixin, AnonymousPageCacheMixin, KeysetPaginationMixin,
+        LookupCacheMixin, QuerySetMixin, ListView
+):
     model = Post
     paginate_by = POSTS_ON_PAGE
     template_name = 'blog/category.html'
-    ordering = ['-pub_date']
+    ordering = ['-pub_date', '-id']
+    query_budget = 5
+
+    def get_cache_versions(self):
+        return [f'category:{self.kwargs["category_slug"]}']
+
+    @property
+    def category(self):
+        return self.lookup('category', lambda: get_object_or_404(
+            Category,
+            is_published=True,
+            slug=self.kwargs.get('category_slug')
+        ))
 
     def get_queryset(self):
-        category_slug = self.kwargs.get('category_slug')
-        category = get_object_or_404(Category, slug=category_slug)
-        queryset = super().get_queryset().filter(
-            category=category,
+        return super().get_queryset().filter(
+            category=self.category,
         )
-        return queryset.annotate(comment_count=Count('comment'))
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        category_slug = self.kwargs.get('category_slug')
-        category = get_object_or_404(Category, slug=category_slug)
-        context['category'] = category
+        context['category'] = self.category
         return context
 
-    def dispatch(self, request, *args, **kwargs):
-        category_slug = self.kwargs.get('category_slug')
-        get_object_or_404(
-            Category,
-            is_published=True,
-            slug=category_slug
+
+class SearchView(QuerySetMixin, ListView):
+    """Поиск по публикациям и комментариям к ним.
+
+    Индекс отдаёт id видимых в ленте публикаций по убыванию
+    релевантности, и только для текущей страницы загружаются сами
+    публикации.
+    """
+
+    model = Post
+    paginate_by = POSTS_ON_PAGE
+    paginator_class = NumberedPaginator
+    template_name = 'blog/search.html'
+    query_kwarg = 'q'
+    query_budget = 5
+
+    def get_search_query(self):
+        return self.request.GET.get(self.query_kwarg, '').strip()
+
+    def get_queryset(self):
+        return search_post_ids(
+            self.get_search_query(), super().get_queryset()
         )
-        return super().dispatch(request, *args, **kwargs)
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator, page, post_ids, is_paginated = super().paginate_queryset(
+            queryset, page_size
+        )
+        posts = super().get_queryset().in_bulk(post_ids)
+        page.object_list = [posts[pk] for pk in post_ids if pk in posts]
+        return paginator, page, page.object_list, is_paginated
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.get_search_query()
+        context['search_query'] = query
+        if query:
+            context['page_query_prefix'] = (
+                urlencode({self.query_kwarg: query}) + '&'
+            )
+        return context
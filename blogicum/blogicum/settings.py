@@ -33,11 +33,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.SlowQueryMiddleware',
+    'core.middleware.TemplateTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -74,6 +78,102 @@ DATABASES = {
     }
 }
 
+# Файлы, которые сервер пишет во время работы; каталог не в git.
+VAR_DIR = BASE_DIR / 'var'
+CACHE_DIR = VAR_DIR / 'cache'
+
+# Кэш по умолчанию общий для всех процессов сервера на узле: версии
+# страниц поднимает тот процесс, что сохранил строку, а видеть их должны
+# все. На нескольких узлах нужен сетевой бэкенд (Redis, Memcached) с тем
+# же MetricsCacheMixin.
+CACHES = {
+    'default': {
+        'BACKEND': 'core.metrics.MetricsFileBasedCache',
+        'LOCATION': CACHE_DIR / 'default',
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    },
+    # Фрагменты карточек публикаций: ключ содержит версию карточки, поэтому
+    # устаревшие записи не удаляются, а вытесняются при переполнении, и
+    # кэш может быть своим у каждого процесса. LocMemCache при переполнении
+    # удаляет MAX_ENTRIES // CULL_FREQUENCY давно не читанных записей —
+    # здесь ровно одну.
+    'fragments': {
+        'BACKEND': 'core.metrics.MetricsLocMemCache',
+        'LOCATION': 'fragments',
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+            'CULL_FREQUENCY': 5000,
+        },
+    },
+}
+
+# Сколько секунд живёт закэшированная страница для анонимных посетителей.
+PAGE_CACHE_TIMEOUT = 60 * 10
+
+# Доля запросов, для которых core.middleware.MetricsMiddleware считает
+# SQL, время шаблонов и обращения к кэшу; 0 отключает эти замеры. Число,
+# коды статуса и общее время учитываются для всех запросов.
+METRICS_SAMPLE_RATE = 0.05
+# Каталог, через который процессы сервера складывают замеры для /metrics;
+# None — только текущий процесс. Очищается при перезапуске сервиса.
+METRICS_DIR = None
+# Как часто процесс переписывает свой файл в METRICS_DIR, секунд.
+METRICS_FLUSH_INTERVAL = 5
+# Токен для /metrics без входа сотрудника: Prometheus передаёт его
+# в заголовке Authorization: Bearer. None — только сотрудникам.
+METRICS_TOKEN = None
+
+# Профили запросов (core.middleware.ProfilingMiddleware): каталог для
+# файлов, например VAR_DIR / 'profiles'; None отключает профилирование.
+PROFILE_DIR = None
+# Доля запросов, профилируемых без просьбы сотрудника.
+PROFILE_SAMPLE_RATE = 0
+# Интервал выборки стеков для .folded, секунд.
+PROFILE_INTERVAL = 0.005
+
+# SQL-запросы дольше стольких секунд попадают в журнал
+# core.slow_queries; None отключает журнал.
+SLOW_QUERY_THRESHOLD = 0.2
+
+# Доля запросов с замером шаблонов и тегов (core.template_timing);
+# при нуле обёртки не ставятся.
+TEMPLATE_TIMING_SAMPLE_RATE = 0
+# Сколько самых долгих меток попадает в строку журнала.
+TEMPLATE_TIMING_TOP = 10
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json_lines': {'()': 'core.slow_queries.JsonLinesFormatter'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+        'slow_queries': {
+            'class': 'core.slow_queries.JsonLinesFileHandler',
+            'filename': VAR_DIR / 'logs' / 'slow_queries.jsonl',
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'formatter': 'json_lines',
+        },
+    },
+    'loggers': {
+        'blogicum.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'blogicum.templates': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -122,6 +222,18 @@ LOGIN_REDIRECT_URL = 'blog:index'
 
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Файлы хранятся под хэшем содержимого, одинаковые загрузки — один файл.
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+
+# Уменьшенные копии Post.image: имя варианта и наибольшая ширина в пикселях.
+POST_IMAGE_VARIANTS = {
+    'card': 640,
+    'detail': 1280,
+    'full': 2048,
+}
+# Дополнительно сохранять каждый вариант в WebP.
+POST_IMAGE_WEBP = True
+
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 
 EMAIL_FILE_PATH = BASE_DIR / 'sent_emails'
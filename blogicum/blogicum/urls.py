@@ -5,6 +5,8 @@ from django.views.generic.edit import CreateView
 from django.conf.urls.static import static
 from django.conf import settings
 
+from core.views import metrics, serve_media
+
 
 handler404 = 'core.views.page_not_found'
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
@@ -12,6 +14,8 @@ handler500 = 'core.views.server_issues'
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics, name='metrics'),
+    path('api/v1/', include('blog.api_urls', namespace='api_v1')),
     path('', include('blog.urls', namespace='blog')),
     path('posts/', include('blog.urls', namespace='blog_posts')),
     path('category/', include('blog.urls', namespace='blog_category')),
@@ -27,4 +31,6 @@ urlpatterns = [
         ),
         name='registration',
     ),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+] + static(
+    settings.MEDIA_URL, view=serve_media, document_root=settings.MEDIA_ROOT
+)
@@ -0,0 +1,153 @@
+import hashlib
+import uuid
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.functional import cached_property
+from django.utils.http import http_date, quote_etag
+
+VERSION_PREFIX = 'version:'
+PAGE_PREFIX = 'page:'
+
+
+def new_version(at=None):
+    """Версия — момент изменения и случайный хвост, а не счётчик.
+
+    Если ключ версии вытеснен из кэша, новая версия гарантированно
+    не совпадёт ни с одной старой, а момент служит для Last-Modified.
+    """
+    moment = (at or timezone.now()).timestamp()
+    return f'{moment:.6f}-{uuid.uuid4().hex}'
+
+
+def version_time(version):
+    moment = float(version.partition('-')[0])
+    return datetime.fromtimestamp(moment, tz=timezone.utc)
+
+
+def get_versions(names):
+    """Текущие версии по именам; отсутствующие заводятся заново."""
+    keys = [VERSION_PREFIX + name for name in names]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        # add() не перезапишет версию, которую успел завести другой
+        # процесс, и все процессы отдадут один и тот же ETag.
+        for key in missing:
+            cache.add(key, new_version(), None)
+        versions.update(cache.get_many(missing))
+    return [versions[key] for key in keys]
+
+
+def bump_versions(*names, at=None):
+    """Делает недействительным всё, что закэшировано под этими версиями.
+
+    at — время изменения данных, по умолчанию текущее.
+    """
+    if names:
+        cache.set_many(
+            {VERSION_PREFIX + name: new_version(at) for name in names}, None
+        )
+
+
+def versioned_key(prefix, versions, *parts):
+    """Ключ, который меняется при подъёме любой из версий."""
+    raw = '|'.join([*parts, *versions])
+    return prefix + hashlib.md5(raw.encode()).hexdigest()
+
+
+class CacheVersionsMixin:
+    """Представление перечисляет в get_cache_versions имена версий,
+    от которых зависит страница; сигналы моделей поднимают эти версии.
+    """
+
+    def get_cache_versions(self):
+        return []
+
+    @cached_property
+    def current_versions(self):
+        return get_versions(self.get_cache_versions())
+
+
+class ConditionalGetMixin(CacheVersionsMixin):
+    """Отвечает 304 по ETag/Last-Modified, не трогая базу и шаблоны.
+
+    ETag складывается из версий страницы и того, кто её смотрит.
+    Версии лежат в общем для процессов сервера кэше (см. CACHES), поэтому
+    изменение, сделанное в одном процессе, меняет ETag во всех.
+    Last-Modified — самый поздний момент изменения среди версий; его
+    получают только анонимы, иначе после входа браузер мог бы получить
+    304 на закэшированную гостевую страницу.
+    """
+
+    def get_etag(self):
+        request = self.request
+        viewer = 'anonymous'
+        if request.user.is_authenticated:
+            # Токен CSRF в формах страницы меняется с каждой сессией.
+            viewer = f'{request.user.pk}:{request.META.get("CSRF_COOKIE")}'
+        raw = '|'.join([request.get_full_path(), viewer,
+                        *self.current_versions])
+        return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+    def get_last_modified(self):
+        if self.request.user.is_authenticated or not self.current_versions:
+            return None
+        return max(map(version_time, self.current_versions))
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+        etag = self.get_etag()
+        last_modified = self.get_last_modified()
+        timestamp = last_modified and int(last_modified.timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp
+        )
+        if response is not None:
+            return response
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+            if timestamp:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
+
+
+class AnonymousPageCacheMixin(CacheVersionsMixin):
+    """Кэширует целиком страницы, которые видят анонимные посетители.
+
+    Когда сигналы поднимают одну из версий страницы, она перестраивается
+    при следующем запросе.
+    """
+
+    page_cache_timeout = settings.PAGE_CACHE_TIMEOUT
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET' or request.user.is_authenticated:
+            return super().dispatch(request, *args, **kwargs)
+        key = versioned_key(
+            PAGE_PREFIX, self.current_versions, request.get_full_path()
+        )
+        response = cache.get(key)
+        if response is not None:
+            return response
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+
+        def store(response):
+            # Страница с CSRF-токеном или cookie персональна.
+            if not request.META.get('CSRF_COOKIE_USED') and not (
+                response.cookies
+            ):
+                cache.set(key, response, self.page_cache_timeout)
+
+        if hasattr(response, 'add_post_render_callback'):
+            response.add_post_render_callback(store)
+        else:
+            store(response)
+        return response
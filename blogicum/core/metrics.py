@@ -0,0 +1,459 @@
+"""Замеры запросов: общее время, SQL, шаблоны и обращения к кэшу.
+
+MetricsMiddleware считает в REGISTRY по имени маршрута каждый запрос:
+число, код статуса и общее время. Для доли запросов METRICS_SAMPLE_RATE
+он заводит ещё RequestMetrics и кладёт его в current. Обёртка выполнения
+SQL, обратный вызов после рендера шаблона и кэш с MetricsCacheMixin
+пишут в него, пока запрос обрабатывается; по завершении замеры уходят
+в заголовок Server-Timing и в гистограммы SQL, шаблонов и кэша.
+Запросы вне выборки проходят без обёрток: current остаётся None.
+"""
+import atexit
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from copy import copy
+
+from django.conf import settings
+from django.core.files import locks
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+
+current = ContextVar('request_metrics', default=None)
+
+SECONDS_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+UNRESOLVED = '<unresolved>'
+
+
+class RequestMetrics:
+    __slots__ = (
+        'started', 'duration', 'db_queries', 'db_time', 'template_time',
+        'cache_hits', 'cache_misses', 'render_started',
+    )
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.render_started = None
+
+    def execute(self, execute, sql, params, many, context):
+        """Обёртка для connection.execute_wrapper()."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.db_queries += 1
+
+    def rendered(self, response):
+        if self.render_started is not None:
+            self.template_time += time.perf_counter() - self.render_started
+            self.render_started = None
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.started
+
+    def server_timing(self):
+        return ', '.join((
+            f'db;dur={self.db_time * 1000:.1f};'
+            f'desc="{self.db_queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'cache;desc="{self.cache_hits} hits, '
+            f'{self.cache_misses} misses"',
+            f'total;dur={self.duration * 1000:.1f}',
+        ))
+
+
+class Histogram:
+    """Гистограмма с накопительными границами, как в Prometheus."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # Последняя ячейка — значения больше всех границ (+Inf).
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        return {
+            'buckets': self.buckets, 'counts': list(self.counts),
+            'sum': self.sum, 'count': self.count,
+        }
+
+
+def _read_json(path):
+    try:
+        with open(path) as stream:
+            return json.load(stream)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    # Замена целиком: читатель не увидит недописанный файл.
+    with open(path + '.tmp', 'w') as stream:
+        json.dump(data, stream)
+    os.replace(path + '.tmp', path)
+
+
+def _is_running(pid):
+    if os.name == 'nt':
+        # os.kill() в Windows завершает процесс, а не проверяет его.
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Registry:
+    """Гистограммы и счётчики процесса по имени маршрута.
+
+    С METRICS_DIR процесс не реже раза в METRICS_FLUSH_INTERVAL секунд
+    и при выходе записывает свои замеры в отдельный файл этого каталога,
+    а collect() складывает файлы всех процессов. Файлы завершившихся
+    процессов при записи сливаются в ARCHIVE, чтобы счётчики не убывали,
+    а каталог не рос с каждым перезапуском воркера. Каталог очищают при
+    перезапуске сервиса, иначе в суммы попадут прошлые запуски.
+    """
+
+    ARCHIVE = 'archive.json'
+
+    HISTOGRAMS = {
+        'request_seconds': SECONDS_BUCKETS,
+        'db_seconds': SECONDS_BUCKETS,
+        'db_queries': QUERY_BUCKETS,
+        'template_seconds': SECONDS_BUCKETS,
+    }
+    # Гистограммы, кроме request_seconds, и счётчики кэша пополняют
+    # только запросы из выборки; их число — sampled_requests.
+    SAMPLED_HISTOGRAMS = ('db_seconds', 'db_queries', 'template_seconds')
+    COUNTERS = ('requests', 'sampled_requests', 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+        self.totals = {}
+        self.flushed = time.monotonic()
+        self._pid = None
+        self._file_name = None
+        atexit.register(self.flush)
+
+    def _view(self, view):
+        if view not in self.views:
+            self.views[view] = {
+                **{
+                    name: Histogram(buckets)
+                    for name, buckets in self.HISTOGRAMS.items()
+                },
+                **{name: 0 for name in self.COUNTERS},
+                'statuses': {},
+            }
+        return self.views[view]
+
+    def record(self, view, status, duration, metrics=None):
+        """Учитывает запрос; metrics — замеры, если он попал в выборку."""
+        with self.lock:
+            entry = self._view(view)
+            entry['request_seconds'].observe(duration)
+            entry['requests'] += 1
+            statuses = entry['statuses']
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if metrics is not None:
+                entry['db_seconds'].observe(metrics.db_time)
+                entry['db_queries'].observe(metrics.db_queries)
+                entry['template_seconds'].observe(metrics.template_time)
+                entry['sampled_requests'] += 1
+                entry['cache_hits'] += metrics.cache_hits
+                entry['cache_misses'] += metrics.cache_misses
+        self.maybe_flush()
+
+    def increment(self, name, amount=1):
+        with self.lock:
+            self.totals[name] = self.totals.get(name, 0) + amount
+        self.maybe_flush()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'views': {
+                    view: {
+                        name: (
+                            value.snapshot() if isinstance(value, Histogram)
+                            else copy(value)
+                        )
+                        for name, value in entry.items()
+                    }
+                    for view, entry in self.views.items()
+                },
+                'totals': dict(self.totals),
+            }
+
+    def clear(self):
+        with self.lock:
+            self.views.clear()
+            self.totals.clear()
+
+    @property
+    def file_name(self):
+        # После fork у дочернего процесса должен быть свой файл.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._file_name = f'{self._pid}-{uuid.uuid4().hex[:8]}.json'
+        return self._file_name
+
+    def maybe_flush(self):
+        interval = settings.METRICS_FLUSH_INTERVAL
+        if settings.METRICS_DIR and (
+            time.monotonic() - self.flushed >= interval
+        ):
+            self.flush()
+
+    def flush(self):
+        directory = settings.METRICS_DIR
+        if not directory:
+            return
+        self.flushed = time.monotonic()
+        _write_json(os.path.join(directory, self.file_name), self.snapshot())
+        self.archive_dead(directory)
+
+    def read_archive(self, directory):
+        return _read_json(os.path.join(directory, self.ARCHIVE)) or {
+            'views': {}, 'totals': {}, 'generation': 0, 'merged': [],
+        }
+
+    def dead_files(self, directory):
+        names = []
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            name = os.path.basename(path)
+            pid = name.partition('-')[0]
+            if pid.isdigit() and not _is_running(int(pid)):
+                names.append(name)
+        return names
+
+    def archive_dead(self, directory):
+        """Сливает файлы завершившихся процессов в ARCHIVE и удаляет их.
+
+        В архиве перечислены слитые файлы: пока их не удалили, collect()
+        их пропускает и не считает дважды.
+        """
+        lock_path = os.path.join(directory, self.ARCHIVE + '.lock')
+        with open(lock_path, 'a') as lock:
+            locks.lock(lock, locks.LOCK_EX)
+            try:
+                dead = self.dead_files(directory)
+                if not dead:
+                    return
+                archive = self.read_archive(directory)
+                fresh = [
+                    _read_json(os.path.join(directory, name))
+                    for name in dead if name not in archive['merged']
+                ]
+                fresh = [snapshot for snapshot in fresh if snapshot]
+                if fresh:
+                    _write_json(os.path.join(directory, self.ARCHIVE), {
+                        **merge([archive, *fresh]),
+                        'generation': archive['generation'] + 1,
+                        'merged': dead,
+                    })
+                for name in dead:
+                    try:
+                        os.remove(os.path.join(directory, name))
+                    except FileNotFoundError:
+                        pass
+            finally:
+                locks.unlock(lock)
+
+    def collect(self):
+        """Сумма замеров этого процесса, архива и файлов остальных."""
+        snapshots = [self.snapshot()]
+        directory = settings.METRICS_DIR
+        if directory:
+            snapshots.extend(self.read_directory(directory))
+        return merge(snapshots)
+
+    def read_directory(self, directory):
+        while True:
+            archive = self.read_archive(directory)
+            skipped = {self.file_name, self.ARCHIVE, *archive['merged']}
+            snapshots = [archive]
+            for path in glob.glob(os.path.join(directory, '*.json')):
+                if os.path.basename(path) not in skipped:
+                    snapshot = _read_json(path)
+                    if snapshot:
+                        snapshots.append(snapshot)
+            # Архив переписали, пока читали файлы: часть из них могла
+            # успеть попасть в него и исчезнуть.
+            generation = self.read_archive(directory)['generation']
+            if generation == archive['generation']:
+                return snapshots
+
+
+def _add(target, value):
+    if isinstance(value, dict) and 'buckets' in value:
+        if target is None:
+            return {**value, 'counts': list(value['counts'])}
+        target['counts'] = [
+            a + b for a, b in zip(target['counts'], value['counts'])
+        ]
+        target['sum'] += value['sum']
+        target['count'] += value['count']
+        return target
+    if isinstance(value, dict):
+        target = target or {}
+        for key, item in value.items():
+            target[key] = target.get(key, 0) + item
+        return target
+    return (target or 0) + value
+
+
+def merge(snapshots):
+    views = {}
+    totals = {}
+    for snapshot in snapshots:
+        for name, value in snapshot['totals'].items():
+            totals[name] = totals.get(name, 0) + value
+        for view, entry in snapshot['views'].items():
+            target = views.setdefault(view, {})
+            for name, value in entry.items():
+                target[name] = _add(target.get(name), value)
+    return {'views': views, 'totals': totals}
+
+
+REGISTRY = Registry()
+
+
+class MetricsCacheMixin:
+    """Считает попадания и промахи get() в замерах текущего запроса.
+
+    get_many() и get_or_set() базового класса сводятся к get().
+    """
+
+    _miss = object()
+
+    def get(self, key, default=None, version=None):
+        metrics = current.get()
+        if metrics is None:
+            return super().get(key, default, version)
+        value = super().get(key, self._miss, version)
+        if value is self._miss:
+            metrics.cache_misses += 1
+            return default
+        metrics.cache_hits += 1
+        return value
+
+
+class MetricsFileBasedCache(MetricsCacheMixin, FileBasedCache):
+    pass
+
+
+class MetricsLocMemCache(MetricsCacheMixin, LocMemCache):
+    pass
+
+
+PREFIX = 'blogicum'
+HISTOGRAM_HELP = {
+    'request_seconds': (
+        'request_duration_seconds', 'Время обработки запроса.'
+    ),
+    'db_seconds': (
+        'db_duration_seconds', 'Время SQL-запросов за запрос (выборка).'
+    ),
+    'db_queries': ('db_queries', 'Число SQL-запросов за запрос (выборка).'),
+    'template_seconds': (
+        'template_duration_seconds',
+        'Время рендера шаблонов за запрос (выборка).',
+    ),
+}
+
+
+def _labels(**labels):
+    escaped = (
+        (name, str(value).replace('\\', r'\\').replace('"', r'\"')
+         .replace('\n', r'\n'))
+        for name, value in labels.items()
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _histogram_lines(metric, view, histogram):
+    cumulative = 0
+    bounds = [*map(_number, histogram['buckets']), '+Inf']
+    for bound, count in zip(bounds, histogram['counts']):
+        cumulative += count
+        yield f'{metric}_bucket{_labels(view=view, le=bound)} {cumulative}'
+    yield f'{metric}_sum{_labels(view=view)} {_number(histogram["sum"])}'
+    yield f'{metric}_count{_labels(view=view)} {histogram["count"]}'
+
+
+def render_prometheus(snapshot):
+    """Текстовый формат Prometheus для результата collect()."""
+    views = sorted(snapshot['views'].items())
+    lines = []
+    for key, (name, help_text) in HISTOGRAM_HELP.items():
+        metric = f'{PREFIX}_{name}'
+        lines += [f'# HELP {metric} {help_text}',
+                  f'# TYPE {metric} histogram']
+        for view, entry in views:
+            lines.extend(_histogram_lines(metric, view, entry[key]))
+    metric = f'{PREFIX}_responses_total'
+    lines += [f'# HELP {metric} Ответы по маршруту и коду статуса.',
+              f'# TYPE {metric} counter']
+    for view, entry in views:
+        for status, count in sorted(entry['statuses'].items()):
+            lines.append(
+                f'{metric}{_labels(view=view, status=status)} {count}'
+            )
+    metric = f'{PREFIX}_sampled_requests_total'
+    lines += [f'# HELP {metric} Запросы, попавшие в выборку замеров.',
+              f'# TYPE {metric} counter']
+    lines += [
+        f'{metric}{_labels(view=view)} {entry["sampled_requests"]}'
+        for view, entry in views
+    ]
+    metric = f'{PREFIX}_cache_requests_total'
+    lines += [f'# HELP {metric} Обращения к кэшу из выборки: попадания '
+              f'и промахи.',
+              f'# TYPE {metric} counter']
+    for view, entry in views:
+        for result, key in (('hit', 'cache_hits'), ('miss', 'cache_misses')):
+            lines.append(
+                f'{metric}{_labels(view=view, result=result)} {entry[key]}'
+            )
+    metric = f'{PREFIX}_cache_hit_ratio'
+    lines += [f'# HELP {metric} Доля попаданий в кэш.',
+              f'# TYPE {metric} gauge']
+    for view, entry in views:
+        lookups = entry['cache_hits'] + entry['cache_misses']
+        if lookups:
+            ratio = entry['cache_hits'] / lookups
+            lines.append(f'{metric}{_labels(view=view)} {ratio!r}')
+    for name, value in sorted(snapshot['totals'].items()):
+        metric = f'{PREFIX}_{name}_total'
+        lines += [f'# TYPE {metric} counter', f'{metric} {value}']
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,169 @@
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import template_timing
+from .metrics import REGISTRY, UNRESOLVED, RequestMetrics, current
+from .profiling import RequestProfile
+from .slow_queries import current_view
+
+
+def _wrap_queries(stack, wrapper):
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(wrapper))
+
+
+class MetricsMiddleware:
+    """Считает все запросы, замеряет выборку и отдаёт Server-Timing.
+
+    Число, код статуса и общее время учитываются для каждого запроса;
+    SQL, шаблоны и кэш — для доли METRICS_SAMPLE_RATE. Заголовок
+    получают только сотрудники, а с DEBUG — все. Стоит первым
+    в MIDDLEWARE, чтобы общее время включало остальные middleware.
+    У потоковых ответов замеры заканчиваются на заголовках: тело
+    отдаётся уже после выхода из middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        sample_rate = settings.METRICS_SAMPLE_RATE
+        if sample_rate and random.random() < sample_rate:
+            response, metrics = self.measure(request)
+        else:
+            response, metrics = self.get_response(request), None
+        match = request.resolver_match
+        REGISTRY.record(
+            match.view_name if match else UNRESOLVED, response.status_code,
+            time.perf_counter() - started, metrics,
+        )
+        # Время и число SQL-запросов выдают устройство сервиса.
+        user = getattr(request, 'user', None)
+        if metrics is not None and (
+            settings.DEBUG or (user is not None and user.is_staff)
+        ):
+            response['Server-Timing'] = metrics.server_timing()
+        return response
+
+    def measure(self, request):
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        try:
+            with ExitStack() as stack:
+                _wrap_queries(stack, metrics.execute)
+                response = self.get_response(request)
+        finally:
+            current.reset(token)
+        metrics.finish()
+        return response, metrics
+
+    def process_template_response(self, request, response):
+        metrics = current.get()
+        if metrics is not None:
+            # Шаблон рендерится сразу после этого хука.
+            metrics.render_started = time.perf_counter()
+            response.add_post_render_callback(metrics.rendered)
+        return response
+
+
+class ProfilingMiddleware:
+    """Профилирует запрос по просьбе сотрудника или по выборке.
+
+    Сотрудник включает профиль заголовком X-Profile: 1 или параметром
+    ?_profile=1; кроме того, профилируется доля PROFILE_SAMPLE_RATE всех
+    запросов. Файлы ложатся в PROFILE_DIR (см. core.profiling); на
+    запрос сотрудника их общее имя возвращается в заголовке X-Profile-Id.
+    Без PROFILE_DIR middleware исключается из цепочки при запуске.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILE_DIR:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def asked_by_staff(self, request):
+        asked = (
+            request.headers.get('X-Profile') == '1'
+            or request.GET.get('_profile') == '1'
+        )
+        # Пользователь загружается, только если профиль попросили.
+        return asked and request.user.is_staff
+
+    def sampled(self):
+        sample_rate = settings.PROFILE_SAMPLE_RATE
+        return bool(sample_rate) and random.random() < sample_rate
+
+    def __call__(self, request):
+        asked = self.asked_by_staff(request)
+        if not asked and not self.sampled():
+            return self.get_response(request)
+        profile = RequestProfile(settings.PROFILE_INTERVAL)
+        with ExitStack() as stack:
+            _wrap_queries(stack, profile.execute)
+            stack.enter_context(profile)
+            response = self.get_response(request)
+        name = profile.save(settings.PROFILE_DIR, request, response)
+        # Имя файла — внутренние сведения, посторонним его не показываем.
+        if asked:
+            response['X-Profile-Id'] = name
+        return response
+
+
+class SlowQueryMiddleware:
+    """Запоминает маршрут запроса для журнала медленных SQL-запросов."""
+
+    def __init__(self, get_response):
+        if settings.SLOW_QUERY_THRESHOLD is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = current_view.set(None)
+        try:
+            return self.get_response(request)
+        finally:
+            current_view.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        current_view.set(request.resolver_match.view_name)
+
+
+class TemplateTimingMiddleware:
+    """Пишет в журнал самые долгие шаблоны, include и теги запроса.
+
+    Замеряется доля TEMPLATE_TIMING_SAMPLE_RATE запросов; при нуле
+    middleware исключается из цепочки и шаблоны не оборачиваются.
+    Строка журнала — TEMPLATE_TIMING_TOP меток по собственному времени
+    (см. core.template_timing).
+    """
+
+    def __init__(self, get_response):
+        if not settings.TEMPLATE_TIMING_SAMPLE_RATE:
+            raise MiddlewareNotUsed
+        template_timing.install()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.TEMPLATE_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+        timings = template_timing.TemplateTimings()
+        token = template_timing.current.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            template_timing.current.reset(token)
+        if timings.entries:
+            match = request.resolver_match
+            template_timing.logger.info(
+                '%s: %.1f мс в шаблонах; %s',
+                match.view_name if match else UNRESOLVED,
+                timings.total * 1000,
+                timings.report(settings.TEMPLATE_TIMING_TOP),
+            )
+        return response
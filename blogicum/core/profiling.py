@@ -0,0 +1,117 @@
+"""Профилирование отдельных запросов в работающем сервисе.
+
+Для каждого профилированного запроса в PROFILE_DIR пишутся три файла
+с общим именем:
+
+- .prof — cProfile, открывается pstats, snakeviz и т. п.;
+- .folded — стеки из выборки по времени в формате flamegraph.pl
+  и speedscope: «кадр;кадр;… число»;
+- .json — маршрут, адрес, код ответа, время и выполненные SQL-запросы
+  (без параметров: в них бывают личные данные).
+"""
+import cProfile
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.utils import timezone
+
+MAX_QUERIES = 1000
+
+
+class StackSampler(threading.Thread):
+    """Раз в interval секунд снимает стек потока thread_id."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f'{code.co_name} ({os.path.basename(code.co_filename)}'
+                    f':{code.co_firstlineno})'
+                )
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def folded(self):
+        return ''.join(
+            f'{stack} {count}\n' for stack, count in self.stacks.items()
+        )
+
+
+class RequestProfile:
+    """cProfile, выборка стеков и SQL одного запроса."""
+
+    def __init__(self, interval):
+        self.profiler = cProfile.Profile()
+        self.sampler = StackSampler(threading.get_ident(), interval)
+        self.queries = []
+        self.started = None
+        self.duration = None
+
+    def execute(self, execute, sql, params, many, context):
+        """Обёртка для connection.execute_wrapper()."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if len(self.queries) < MAX_QUERIES:
+                self.queries.append({
+                    'sql': sql,
+                    'seconds': time.perf_counter() - started,
+                })
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.sampler.start()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.disable()
+        self.sampler.stop()
+        self.duration = time.perf_counter() - self.started
+
+    def save(self, directory, request, response):
+        """Пишет файлы профиля и возвращает их общее имя."""
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        name = '{}-{}-{}'.format(
+            timezone.now().strftime('%Y%m%d-%H%M%S'),
+            re.sub(r'[^\w.-]', '_', view),
+            uuid.uuid4().hex[:8],
+        )
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, name)
+        self.profiler.dump_stats(path + '.prof')
+        with open(path + '.folded', 'w') as stream:
+            stream.write(self.sampler.folded())
+        with open(path + '.json', 'w') as stream:
+            json.dump({
+                'view': view,
+                'method': request.method,
+                'path': request.get_full_path(),
+                'status': response.status_code,
+                'seconds': self.duration,
+                'queries': self.queries,
+            }, stream, ensure_ascii=False, indent=2)
+        return name
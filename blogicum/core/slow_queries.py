@@ -0,0 +1,143 @@
+"""Журнал медленных SQL-запросов.
+
+Обёртка выполнения ставится на каждое новое соединение с базой, если
+SLOW_QUERY_THRESHOLD не None. Запрос дольше порога уходит в логгер
+LOGGER_NAME одной записью: маршрут (его запоминает
+core.middleware.SlowQueryMiddleware), SQL с параметрами, EXPLAIN QUERY
+PLAN для SELECT и кадры стека из кода приложения и шаблонов — ближайший
+к запросу первым, он же отдельно в origin. По settings.LOGGING логгер пишет
+JSON Lines с ротацией.
+"""
+import json
+import logging
+import os
+import sys
+import time
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.db import DatabaseError
+
+LOGGER_NAME = 'blogicum.slow_queries'
+APP_DIRS = ('blog/', 'core/')
+# Обёртки и middleware замеров есть в стеке любого запроса.
+SKIPPED_FILES = (
+    'core/metrics.py', 'core/middleware.py', 'core/profiling.py',
+    'core/slow_queries.py',
+)
+MAX_FRAMES = 10
+MAX_PARAMS = 20
+
+logger = logging.getLogger(LOGGER_NAME)
+current_view = ContextVar('current_view', default=None)
+
+
+def _template_frame(frame):
+    node = frame.f_locals.get('self')
+    origin = getattr(node, 'origin', None)
+    token = getattr(node, 'token', None)
+    if origin is None or token is None:
+        return None
+    return f'{origin.template_name}:{token.lineno} {{% {token.contents} %}}'
+
+
+def _app_frames():
+    """Кадры из blog/ и core/, начиная с ближайшего к запросу.
+
+    Ленивые запросы QuerySet часто выполняются уже при рендере шаблона,
+    поэтому первым идёт ближайший тег шаблона, если он есть.
+    """
+    frames = []
+    template = None
+    frame = sys._getframe(1)
+    while frame is not None and len(frames) < MAX_FRAMES:
+        code = frame.f_code
+        if template is None and code.co_name == 'render_annotated':
+            template = _template_frame(frame)
+            if template:
+                frames.append(template)
+        path = os.path.relpath(code.co_filename, settings.BASE_DIR)
+        path = path.replace(os.sep, '/')
+        if path.startswith(APP_DIRS) and path not in SKIPPED_FILES:
+            frames.append(f'{path}:{frame.f_lineno} {code.co_name}')
+        frame = frame.f_back
+    return frames
+
+
+def _explain(connection, sql, params):
+    if not sql.lstrip()[:6].upper() == 'SELECT':
+        return None
+    # Курсор драйвера в обход execute_wrappers: EXPLAIN не попадает
+    # в метрики, профиль и этот же журнал.
+    try:
+        with connection.cursor() as wrapper, connection.wrap_database_errors:
+            cursor = wrapper.cursor
+            cursor.execute(
+                f'{connection.ops.explain_query_prefix()} {sql}', params
+            )
+            return [str(row[-1]) for row in cursor.fetchall()]
+    except DatabaseError:
+        return None
+
+
+def log_slow_queries(execute, sql, params, many, context):
+    """Обёртка для connection.execute_wrappers."""
+    threshold = settings.SLOW_QUERY_THRESHOLD
+    if threshold is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration = time.perf_counter() - started
+    if duration >= threshold:
+        if many:
+            params = list(params)
+            count = len(params)
+            params = params[:MAX_PARAMS]
+        else:
+            count = 1
+        stack = _app_frames()
+        logger.warning('Медленный запрос: %.3f с', duration, extra={
+            'slow_query': {
+                'view': current_view.get(),
+                'seconds': round(duration, 6),
+                'database': context['connection'].alias,
+                'sql': sql,
+                'params': params,
+                'executions': count,
+                'plan': None if many else _explain(
+                    context['connection'], sql, params
+                ),
+                'stack': stack,
+                'origin': stack[0] if stack else None,
+            },
+        })
+    return result
+
+
+def install(sender, connection, **kwargs):
+    """Приёмник connection_created."""
+    if settings.SLOW_QUERY_THRESHOLD is not None:
+        if log_slow_queries not in connection.execute_wrappers:
+            connection.execute_wrappers.append(log_slow_queries)
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            **getattr(record, 'slow_query', {'message': record.getMessage()}),
+        }
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class JsonLinesFileHandler(RotatingFileHandler):
+    """RotatingFileHandler, создающий каталог журнала при первой записи."""
+
+    def __init__(self, filename, **kwargs):
+        kwargs.setdefault('delay', True)
+        super().__init__(filename, **kwargs)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
@@ -0,0 +1,106 @@
+"""Хранилище медиафайлов с адресацией по содержимому.
+
+Файл сохраняется под именем из SHA-256 содержимого:
+cas/ab/cd/abcd…ef.jpg. Повторная загрузка того же файла его не
+переписывает, а увеличивает счётчик ссылок в соседнем файле .refs;
+delete() уменьшает счётчик и удаляет файл, когда ссылок не осталось.
+Содержимое под таким именем никогда не меняется, поэтому его можно
+кэшировать навсегда.
+
+Файлы, сохранённые раньше, остаются под прежними именами и удаляются
+как обычно.
+"""
+import hashlib
+import os
+import re
+from contextlib import contextmanager
+
+from django.core.files import File, locks
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+PREFIX = 'cas'
+HASHED_NAME = re.compile(
+    rf'^{PREFIX}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/[0-9a-f]{{64}}(\.[0-9a-z]+)?$'
+)
+EXTENSION = re.compile(r'^\.[0-9a-z]{1,10}$')
+REFS_SUFFIX = '.refs'
+
+
+def is_content_addressed(name):
+    return bool(HASHED_NAME.match(name))
+
+
+class _Counter:
+    def __init__(self, count):
+        self.count = count
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        # chunks() сам перематывает файл в начало.
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        if not EXTENSION.match(extension):
+            extension = ''
+        return f'{PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+    @contextmanager
+    def references(self, name):
+        """Счётчик ссылок на name под блокировкой его файла .refs.
+
+        Пока файла нет, ссылок 0; файл без счётчика (например, после
+        сбоя) считается занятым одной ссылкой.
+        """
+        path = self.path(name + REFS_SUFFIX)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        while True:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+            locks.lock(fd, locks.LOCK_EX)
+            # Счётчик могли удалить, пока мы ждали блокировку.
+            try:
+                if os.path.samestat(os.stat(path), os.fstat(fd)):
+                    break
+            except FileNotFoundError:
+                pass
+            locks.unlock(fd)
+            os.close(fd)
+        with os.fdopen(fd, 'r+') as refs:
+            try:
+                counter = _Counter(0)
+                if self.exists(name):
+                    counter.count = max(int(refs.read() or 0), 1)
+                yield counter
+                if counter.count:
+                    refs.seek(0)
+                    refs.truncate()
+                    refs.write(str(counter.count))
+                else:
+                    os.remove(path)
+            finally:
+                locks.unlock(refs)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        with self.references(name) as counter:
+            if not counter.count:
+                self._save(name, content)
+            counter.count += 1
+        return name
+
+    def delete(self, name):
+        if not is_content_addressed(name):
+            return super().delete(name)
+        with self.references(name) as counter:
+            counter.count = max(counter.count - 1, 0)
+            if not counter.count:
+                super().delete(name)
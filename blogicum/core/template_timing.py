@@ -0,0 +1,122 @@
+"""Замеры рендера шаблонов, {% include %} и тегов по запросам.
+
+install() оборачивает Template.render и render_annotated узлов
+{% include %}, {% url %} и тегов из Library.simple_tag() и
+inclusion_tag() (bootstrap_form и т. п.). Пока в current лежит
+TemplateTimings (его ставит core.middleware.TemplateTimingMiddleware),
+каждый такой вызов записывается с полным временем и собственным — без
+вложенных замеренных вызовов. Вне замера обёртки сразу передают вызов
+дальше; uninstall() возвращает исходные методы.
+"""
+import functools
+import logging
+import time
+from contextvars import ContextVar
+
+from django.template.base import Node, Template
+from django.template.defaulttags import URLNode
+from django.template.library import InclusionNode, SimpleNode
+from django.template.loader_tags import IncludeNode
+
+LOGGER_NAME = 'blogicum.templates'
+TIMED_NODES = (IncludeNode, URLNode, SimpleNode, InclusionNode)
+# У этих тегов первый аргумент различает вызовы: имя шаблона, маршрут.
+NAMED_TAGS = ('include', 'url')
+
+logger = logging.getLogger(LOGGER_NAME)
+current = ContextVar('template_timings', default=None)
+
+
+class TemplateTimings:
+    """Число вызовов, полное и собственное время по меткам."""
+
+    def __init__(self):
+        self.entries = {}
+        # Время вложенных замеров для каждого открытого вызова.
+        self.children = []
+
+    def measure(self, label, render, *args):
+        self.children.append(0.0)
+        started = time.perf_counter()
+        try:
+            return render(*args)
+        finally:
+            total = time.perf_counter() - started
+            own = total - self.children.pop()
+            if self.children:
+                self.children[-1] += total
+            calls, total_sum, own_sum = self.entries.get(label, (0, 0, 0))
+            self.entries[label] = (
+                calls + 1, total_sum + total, own_sum + own
+            )
+
+    @property
+    def total(self):
+        return sum(own for _, _, own in self.entries.values())
+
+    def top(self, count):
+        """Метки с наибольшим собственным временем."""
+        return sorted(
+            self.entries.items(), key=lambda item: item[1][2], reverse=True
+        )[:count]
+
+    def report(self, count):
+        return '; '.join(
+            f'{label} ×{calls} {total * 1000:.1f} мс '
+            f'(своё {own * 1000:.1f})'
+            for label, (calls, total, own) in self.top(count)
+        )
+
+
+def _template_label(template):
+    if template.origin and template.origin.template_name:
+        return template.origin.template_name
+    return template.name or '<строка>'
+
+
+def _node_label(node):
+    words = node.token.contents.split()
+    if words[0] in NAMED_TAGS:
+        words = words[:2]
+    else:
+        words = words[:1]
+    return '{% ' + ' '.join(words) + ' %}'
+
+
+def _timed(render, label):
+    @functools.wraps(render)
+    def wrapper(self, context):
+        timings = current.get()
+        if timings is None:
+            return render(self, context)
+        return timings.measure(label(self), render, self, context)
+
+    return wrapper
+
+
+# Класс -> (имя атрибута, исходное значение в его __dict__ или None).
+_originals = {}
+
+
+def install():
+    """Ставит обёртки один раз на процесс; uninstall() их снимает."""
+    if _originals:
+        return
+    _originals[Template] = ('render', Template.__dict__['render'])
+    Template.render = _timed(Template.render, _template_label)
+    for node_class in TIMED_NODES:
+        _originals[node_class] = (
+            'render_annotated', node_class.__dict__.get('render_annotated')
+        )
+        node_class.render_annotated = _timed(
+            Node.render_annotated, _node_label
+        )
+
+
+def uninstall():
+    for cls, (name, original) in _originals.items():
+        if original is None:
+            delattr(cls, name)
+        else:
+            setattr(cls, name, original)
+    _originals.clear()
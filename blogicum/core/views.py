@@ -1,4 +1,15 @@
+import hmac
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
+from django.utils.cache import patch_cache_control
+from django.views.static import serve
+
+from .metrics import REGISTRY, render_prometheus
+from .storage import is_content_addressed
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
 
 
 def page_not_found(request, exception):
@@ -11,3 +22,39 @@ def csrf_failure(request, exception):
 
 def server_issues(request):
     return render(request, 'pages/500.html', status=500)
+
+
+def serve_media(request, path, document_root=None):
+    """Раздача медиафайлов при DEBUG. Файлы с адресацией по содержимому
+    не меняются, и браузер может не перепроверять их.
+    """
+    response = serve(request, path, document_root=document_root)
+    if response.status_code == 200 and is_content_addressed(path):
+        patch_cache_control(
+            response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True
+        )
+    return response
+
+
+def _has_metrics_token(request):
+    token = settings.METRICS_TOKEN
+    scheme, _, credentials = request.headers.get(
+        'Authorization', ''
+    ).partition(' ')
+    return bool(token) and scheme.lower() == 'bearer' and (
+        hmac.compare_digest(credentials.encode(), token.encode())
+    )
+
+
+def metrics(request):
+    """Замеры всех процессов в текстовом формате Prometheus.
+
+    Доступны сотрудникам и запросам с заголовком
+    Authorization: Bearer <METRICS_TOKEN>.
+    """
+    if not (_has_metrics_token(request) or request.user.is_staff):
+        raise Http404
+    return HttpResponse(
+        render_prometheus(REGISTRY.collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -1,5 +1,7 @@
 import os
 import re
+import subprocess
+import sys
 import time
 from http import HTTPStatus
 from inspect import getsource
@@ -18,6 +20,8 @@ from typing import (
 
 import pytest
 from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
 from django.contrib.auth import get_user_model
 from django.db.models import Model, Field
 from django.forms import BaseForm
@@ -41,6 +45,59 @@ def enable_debug_false():
         yield
 
 
+@pytest.fixture(scope="session", autouse=True)
+def cache_locations(tmp_path_factory):
+    # Файловые кэши тестов — не в каталоге работающего сервера.
+    directory = tmp_path_factory.mktemp("cache")
+    for alias, config in settings.CACHES.items():
+        config["LOCATION"] = str(directory / alias)
+
+
+# Другой процесс сервера: поднимает версии кэша, как после сохранения
+# строки. Аргументы — каталог общего кэша и имена версий.
+OTHER_WORKER = """
+import sys
+
+import django
+from django.conf import settings
+
+settings.CACHES["default"]["LOCATION"] = sys.argv[1]
+django.setup()
+
+from core.cache import bump_versions
+
+bump_versions(*sys.argv[2:])
+"""
+
+
+@pytest.fixture
+def other_worker():
+    def bump_versions(*names):
+        subprocess.run(
+            [sys.executable, "-c", OTHER_WORKER,
+             settings.CACHES["default"]["LOCATION"], *names],
+            cwd=settings.BASE_DIR, check=True,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": "blogicum.settings"},
+        )
+
+    return bump_versions
+
+
+@pytest.fixture(scope="session", autouse=True)
+def media_root(tmp_path_factory):
+    # Загруженные в тестах фото не должны попадать в MEDIA_ROOT проекта.
+    with override_settings(MEDIA_ROOT=tmp_path_factory.mktemp("media")):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # База между тестами очищается без сигналов, поэтому и кэши тоже.
+    for alias in settings.CACHES:
+        caches[alias].clear()
+    yield
+
+
 class SafeImportFromContextManager:
     def __init__(
             self,
@@ -363,6 +420,8 @@ def cleanup(request):
                     filename.endswith(".jpg")
                     or filename.endswith(".gif")
                     or filename.endswith(".png")
+                    or filename.endswith(".webp")
+                    or filename.endswith(".refs")
             ):
                 file_path = os.path.join(root, filename)
                 if os.path.getmtime(file_path) >= start_time:
@@ -0,0 +1,75 @@
+import json
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from conftest import N_PER_PAGE
+
+
+def _json(response):
+    assert response.status_code == HTTPStatus.OK
+    content = (
+        b"".join(response.streaming_content)
+        if response.streaming else response.content
+    )
+    return json.loads(content)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_post_list_walks_visible_posts_by_cursor(
+        unlogged_client, many_posts_with_published_locations,
+        posts_with_unpublished_category, future_posts):
+    expected = sorted(
+        many_posts_with_published_locations,
+        key=lambda post: (post.pub_date, post.pk), reverse=True,
+    )
+    seen = []
+    url = f"/api/v1/posts/?limit={N_PER_PAGE}"
+    while url:
+        with CaptureQueriesContext(connection) as queries:
+            page = _json(unlogged_client.get(url))
+        assert len(queries) == 1
+        assert len(page["results"]) <= N_PER_PAGE
+        seen.extend(post["id"] for post in page["results"])
+        url = page["next"]
+    assert seen == [post.pk for post in expected]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_post_detail_comments_and_profile(
+        mixer, user, another_user, unlogged_client,
+        post_with_published_location):
+    post = post_with_published_location
+    mixer.cycle(3).blend(
+        "blog.Comment", post=post, author=mixer.sequence(user, another_user)
+    )
+    detail = _json(unlogged_client.get(f"/api/v1/posts/{post.pk}/"))
+    assert detail["title"] == post.title
+    assert detail["author"] == user.username
+    assert detail["comment_count"] == 3
+
+    comments = _json(
+        unlogged_client.get(f"/api/v1/posts/{post.pk}/comments/?limit=2")
+    )
+    assert len(comments["results"]) == 2
+    rest = _json(unlogged_client.get(comments["next"]))
+    assert len(rest["results"]) == 1 and rest["next"] is None
+
+    profile = _json(unlogged_client.get(f"/api/v1/profiles/{user.username}/"))
+    assert profile["username"] == user.username
+    assert "email" not in profile and "password" not in profile
+
+
+@pytest.mark.django_db(transaction=True)
+def test_api_errors_are_json(unlogged_client, post_with_published_location):
+    post = post_with_published_location
+    post.is_published = False
+    post.save()
+    response = unlogged_client.get(f"/api/v1/posts/{post.pk}/")
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    assert "detail" in response.json()
+    for query in ("cursor=garbage", "limit=0", "limit=many"):
+        response = unlogged_client.get(f"/api/v1/posts/?{query}")
+        assert response.status_code == HTTPStatus.BAD_REQUEST
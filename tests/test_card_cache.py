@@ -0,0 +1,95 @@
+import pytest
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+from django.db import connection
+from django.db.models.signals import post_save
+from django.test.utils import CaptureQueriesContext
+
+from blog.models import Post
+from blog.signals import touch_all_cards
+
+
+def _card_key(post):
+    post.refresh_from_db()
+    return make_template_fragment_key(
+        "post_card", [post.id, post.card_version]
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_post_card_fragment_is_shared_and_versioned(
+        user_client, post_with_published_location):
+    post = post_with_published_location
+    fragments = caches["fragments"]
+    user_client.get("/")
+    key = _card_key(post)
+    assert fragments.get(key), (
+        "Карточка публикации не попала в кэш фрагментов."
+    )
+
+    fragments.set(key, "<article>Карточка из кэша</article>")
+    content = user_client.get(
+        f"/profile/{post.author.username}/"
+    ).content.decode("utf-8")
+    assert "Карточка из кэша" in content, (
+        "Лента профиля должна переиспользовать закэшированную карточку."
+    )
+
+    category = post.category
+    category.title = "Новое название категории"
+    category.save()
+    assert _card_key(post) != key
+    content = user_client.get("/").content.decode("utf-8")
+    assert "Новое название категории" in content
+    assert "Карточка из кэша" not in content
+
+
+@pytest.mark.django_db(transaction=True)
+def test_post_save_bumps_card_version_in_the_database(
+        mixer, user, post_with_published_location):
+    post = post_with_published_location
+    seen = []
+
+    def receiver(sender, instance, **kwargs):
+        seen.append((instance.card_version, instance.comment_count))
+
+    post_save.connect(receiver, sender=Post)
+    try:
+        stale = Post.objects.get(pk=post.pk)
+        mixer.blend("blog.Comment", post=post, author=user)
+        stale.title = "Новый заголовок"
+        stale.save(update_fields=["title"])
+    finally:
+        post_save.disconnect(receiver, sender=Post)
+    fresh = Post.objects.get(pk=post.pk)
+    assert fresh.comment_count == 1
+    assert (stale.card_version, stale.comment_count) == (
+        fresh.card_version, fresh.comment_count
+    )
+    assert seen == [(fresh.card_version, 1)]
+
+
+@pytest.mark.django_db
+def test_cards_are_touched_in_batches(mixer, user):
+    posts = mixer.cycle(5).blend(Post, author=user)
+    with CaptureQueriesContext(connection) as queries:
+        touch_all_cards(Post.objects.all(), batch_size=2)
+    updates = [q for q in queries if q["sql"].startswith("UPDATE")]
+    assert len(updates) == 3
+    assert all(
+        fresh.card_version == post.card_version + 1
+        for post, fresh in zip(posts, Post.objects.order_by("pk"))
+    )
+
+
+def test_fragment_cache_evicts_least_recently_read():
+    fragments = caches["fragments"]
+    fragments.clear()
+    limit = settings.CACHES["fragments"]["OPTIONS"]["MAX_ENTRIES"]
+    fragments.set_many({f"card:{i}": i for i in range(limit)})
+    assert fragments.get("card:0") == 0
+    fragments.set("card:new", "new")
+    assert fragments.get("card:0") == 0
+    assert fragments.get("card:1") is None
+    assert fragments.get(f"card:{limit - 1}") == limit - 1
@@ -0,0 +1,57 @@
+import json
+
+import pytest
+from django.core.management import call_command
+
+from blog.models import Comment, Post
+
+
+@pytest.mark.django_db(transaction=True)
+def test_comment_count_follows_comment_writes(
+        mixer, user, post_with_published_location, post_of_another_author):
+    post = post_with_published_location
+    comments = mixer.cycle(3).blend(Comment, post=post, author=user)
+    post.refresh_from_db()
+    assert post.comment_count == 3
+
+    comments[0].post = post_of_another_author
+    comments[0].save()
+    Comment.objects.filter(pk=comments[1].pk).delete()
+    post.refresh_from_db()
+    post_of_another_author.refresh_from_db()
+    assert post.comment_count == 1
+    assert post_of_another_author.comment_count == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_recount_comments_command(
+        mixer, user, post_with_published_location):
+    post = post_with_published_location
+    mixer.cycle(2).blend(Comment, post=post, author=user)
+    Post.objects.update(comment_count=42)
+    call_command("recount_comments", batch_size=1)
+    post.refresh_from_db()
+    assert post.comment_count == 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_loaddata_counts_comments(tmp_path, user):
+    fixture = [
+        {"model": "blog.comment", "pk": 1, "fields": {
+            "text": "До публикации", "post": 7, "author": user.pk,
+            "created_at": "2023-01-01T00:00:00Z", "is_published": True,
+        }},
+        {"model": "blog.post", "pk": 7, "fields": {
+            "title": "Заголовок", "text": "Текст", "author": user.pk,
+            "pub_date": "2023-01-01T00:00:00Z", "is_published": True,
+            "created_at": "2023-01-01T00:00:00Z",
+        }},
+        {"model": "blog.comment", "pk": 2, "fields": {
+            "text": "После публикации", "post": 7, "author": user.pk,
+            "created_at": "2023-01-01T00:00:00Z", "is_published": True,
+        }},
+    ]
+    path = tmp_path / "fixture.json"
+    path.write_text(json.dumps(fixture), encoding="utf-8")
+    call_command("loaddata", str(path), verbosity=0)
+    assert Post.objects.get(pk=7).comment_count == 2
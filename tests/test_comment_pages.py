@@ -0,0 +1,47 @@
+import pytest
+from bs4 import BeautifulSoup
+from django.utils import timezone
+
+from blog.mixins import COMMENTS_ON_PAGE
+from blog.models import Comment
+
+
+def _comment_ids(content):
+    soup = BeautifulSoup(content, "html.parser")
+    return [
+        int(anchor["name"].removeprefix("comment_"))
+        for anchor in soup.select("a[name^=comment_]")
+    ], soup.select_one("[data-load-comments]")
+
+
+@pytest.mark.django_db
+def test_comments_are_paged_by_cursor(
+        mixer, user, another_user, unlogged_client,
+        post_with_published_location):
+    post = post_with_published_location
+    mixer.cycle(COMMENTS_ON_PAGE + 5).blend(
+        Comment, post=post, author=mixer.sequence(user, another_user)
+    )
+    # Одинаковое время создания: порядок решает id.
+    Comment.objects.update(created_at=timezone.now())
+    expected = list(
+        Comment.objects.order_by("created_at", "pk")
+        .values_list("pk", flat=True)
+    )
+
+    ids, more = _comment_ids(
+        unlogged_client.get(f"/posts/{post.pk}/").content
+    )
+    assert ids == expected[:COMMENTS_ON_PAGE]
+    rest, more = _comment_ids(unlogged_client.get(more["href"]).content)
+    assert rest == expected[COMMENTS_ON_PAGE:]
+    assert more is None
+
+
+@pytest.mark.django_db
+def test_bad_comment_cursor_is_404(
+        unlogged_client, post_with_published_location):
+    response = unlogged_client.get(
+        f"/posts/{post_with_published_location.pk}/comments/?cursor=junk"
+    )
+    assert response.status_code == 404
@@ -0,0 +1,62 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+@pytest.mark.django_db(transaction=True)
+def test_unchanged_pages_answer_not_modified(
+        mixer, unlogged_client, post_with_published_location):
+    post = post_with_published_location
+    urls = [
+        "/",
+        f"/posts/{post.id}/",
+        f"/category/{post.category.slug}/",
+        f"/profile/{post.author.username}/",
+    ]
+    for url in urls:
+        response = unlogged_client.get(url)
+        assert response.status_code == HTTPStatus.OK
+        assert response.has_header("Last-Modified")
+        with CaptureQueriesContext(connection) as queries:
+            not_modified = unlogged_client.get(
+                url, HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+        assert not_modified.status_code == HTTPStatus.NOT_MODIFIED, url
+        assert len(queries) == 0
+        assert unlogged_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        ).status_code == HTTPStatus.NOT_MODIFIED
+
+    etag = unlogged_client.get(f"/posts/{post.id}/")["ETag"]
+    mixer.blend("blog.Comment", post=post, author=post.author)
+    assert unlogged_client.get(
+        f"/posts/{post.id}/", HTTP_IF_NONE_MATCH=etag
+    ).status_code == HTTPStatus.OK
+
+
+@pytest.mark.django_db(transaction=True)
+def test_validators_differ_per_viewer(
+        user_client, unlogged_client, post_with_published_location):
+    anonymous = unlogged_client.get("/")
+    response = user_client.get("/")
+    assert not response.has_header("Last-Modified")
+    assert response["ETag"] != anonymous["ETag"]
+    assert user_client.get(
+        "/", HTTP_IF_NONE_MATCH=anonymous["ETag"]
+    ).status_code == HTTPStatus.OK
+    assert user_client.get(
+        "/", HTTP_IF_NONE_MATCH=response["ETag"]
+    ).status_code == HTTPStatus.NOT_MODIFIED
+
+
+@pytest.mark.django_db(transaction=True)
+def test_change_in_other_worker_invalidates_validators(
+        unlogged_client, post_with_published_location, other_worker):
+    etag = unlogged_client.get("/")["ETag"]
+    assert unlogged_client.get("/")["ETag"] == etag
+    other_worker("feed")
+    response = unlogged_client.get("/", HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+    assert response["ETag"] != etag
@@ -0,0 +1,12 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+
+@pytest.mark.django_db(transaction=True)
+def test_feed_queries_use_indexes(post_with_published_location, comment):
+    out = StringIO()
+    call_command("explain_queries", strict=True, stdout=out)
+    assert "blog:index" in out.getvalue()
+    assert "blog:post_detail" in out.getvalue()
@@ -0,0 +1,39 @@
+import csv
+import gzip
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from blog.models import Post
+
+
+@pytest.mark.django_db(transaction=True)
+def test_export_posts_to_json_lines(many_posts_with_published_locations):
+    out = StringIO()
+    call_command("export_data", "posts", batch_size=3, stdout=out,
+                 stderr=StringIO())
+    rows = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [row["id"] for row in rows] == sorted(
+        post.pk for post in many_posts_with_published_locations
+    )
+    assert {"title", "pub_date", "author_id"} <= set(rows[0])
+
+
+@pytest.mark.django_db(transaction=True)
+def test_export_resumes_gzipped_csv(
+        tmp_path, mixer, user, many_posts_with_published_locations):
+    path = tmp_path / "comments.csv.gz"
+    mixer.blend("blog.Comment", post=many_posts_with_published_locations[0],
+                author=user, text="Строка\nи ещё одна")
+    options = dict(output_format="csv", output=str(path), compress=True,
+                   stdout=StringIO())
+    call_command("export_data", "comments", **options)
+    first = Post.objects.order_by("pk").first()
+    mixer.blend("blog.Comment", post=first, author=user, text="Вторая")
+    call_command("export_data", "comments", resume=True, **options)
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as stream:
+        header, *rows = list(csv.reader(stream))
+    assert header[0] == "id"
+    assert [row[3] for row in rows] == ["Строка\nи ещё одна", "Вторая"]
@@ -0,0 +1,58 @@
+from http import HTTPStatus
+from xml.etree import ElementTree
+
+import pytest
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+
+
+def _read(response):
+    assert response.status_code == HTTPStatus.OK
+    content = (
+        b"".join(response.streaming_content)
+        if response.streaming else response.content
+    )
+    return ElementTree.fromstring(content)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_rss_feed_lists_visible_posts(
+        unlogged_client, post_with_published_location,
+        posts_with_unpublished_category, future_posts):
+    channel = _read(unlogged_client.get("/feeds/rss/")).find("channel")
+    titles = [item.findtext("title") for item in channel.iter("item")]
+    assert titles == [post_with_published_location.title]
+    assert unlogged_client.get("/feeds/json/").status_code == (
+        HTTPStatus.NOT_FOUND
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_feeds_are_cached_until_posts_change(
+        unlogged_client, post_with_published_location):
+    post = post_with_published_location
+    category_url = f"/category/{post.category.slug}/feeds/atom/"
+    profile_url = f"/profile/{post.author.username}/feeds/rss/"
+    first = unlogged_client.get(category_url)
+    entries = list(_read(first).iter(f"{ATOM}entry"))
+    assert [entry.findtext(f"{ATOM}title") for entry in entries] == [
+        post.title
+    ]
+    second = unlogged_client.get(category_url)
+    assert not second.streaming
+    assert _read(second).findtext(f"{ATOM}title") == (
+        f"Блогикум: {post.category.title}"
+    )
+    assert unlogged_client.get(
+        category_url, HTTP_IF_NONE_MATCH=first["ETag"]
+    ).status_code == HTTPStatus.NOT_MODIFIED
+    _read(unlogged_client.get(profile_url))
+
+    post.title = "Новый заголовок"
+    post.save()
+    for url, items in ((category_url, f"{ATOM}entry"), (profile_url, "item")):
+        response = unlogged_client.get(url)
+        assert response.streaming
+        titles = [item.findtext(f"{ATOM}title") or item.findtext("title")
+                  for item in _read(response).iter(items)]
+        assert titles == ["Новый заголовок"]
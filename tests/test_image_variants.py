@@ -0,0 +1,136 @@
+from io import BytesIO
+
+import pytest
+from bs4 import BeautifulSoup
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from PIL import Image
+
+from blog.models import ImageJob, Post
+
+EXIF_ORIENTATION = 0x0112
+
+
+def _photo(width, height):
+    image = Image.new("RGB", (width, height), color=(73, 109, 137))
+    exif = Image.Exif()
+    exif[EXIF_ORIENTATION] = 6  # Снято повёрнутым на 90°.
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", exif=exif)
+    return ContentFile(buffer.getvalue(), name="photo.jpg")
+
+
+@pytest.fixture
+def post_with_photo(mixer, user, published_category):
+    post = mixer.blend(
+        Post, author=user, category=published_category, image=None
+    )
+    post.image = _photo(1500, 3000)
+    post.save()
+    call_command("process_image_jobs", processes=1)
+    return post
+
+
+@pytest.mark.django_db(transaction=True)
+def test_variants_are_resized_and_stripped(post_with_photo):
+    variants = Post.objects.get(pk=post_with_photo.pk).image_variants
+    assert (variants["card"]["width"], variants["card"]["height"]) == (
+        640, 320
+    )
+    assert variants["detail"]["width"] == 1280
+    assert variants["full"]["width"] == 2048
+    for entry in variants.values():
+        for name in (entry["name"], entry["webp"]):
+            with default_storage.open(name) as stored:
+                image = Image.open(stored)
+                assert EXIF_ORIENTATION not in image.getexif()
+                assert image.size == (entry["width"], entry["height"])
+
+
+@pytest.mark.django_db(transaction=True)
+def test_templates_emit_responsive_images(unlogged_client, post_with_photo):
+    variants = Post.objects.get(pk=post_with_photo.pk).image_variants
+    soup = BeautifulSoup(unlogged_client.get("/").content, "html.parser")
+    img = soup.find("img", alt=post_with_photo.title)
+    assert img["loading"] == "lazy"
+    assert (img["width"], img["height"]) == ("640", "320")
+    assert img["src"].endswith(variants["card"]["name"])
+    assert "2048w" in img["srcset"]
+    assert "webp" in img.find_previous("source")["srcset"]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_regenerate_image_variants_command(post_with_photo):
+    Post.objects.filter(pk=post_with_photo.pk).update(image_variants={})
+    call_command("regenerate_image_variants", processes=2, missing_only=True)
+    post = Post.objects.get(pk=post_with_photo.pk)
+    assert post.image_variants["card"]["width"] == 640
+    assert post.card_version > post_with_photo.card_version
+
+
+@pytest.mark.django_db(transaction=True)
+def test_failed_regeneration_keeps_variants(post_with_photo):
+    variants = Post.objects.get(pk=post_with_photo.pk).image_variants
+    # Исходный файл испорчен: новых вариантов не будет.
+    with open(default_storage.path(post_with_photo.image.name), "wb") as file:
+        file.write(b"not an image")
+    call_command("regenerate_image_variants", processes=1)
+    assert Post.objects.get(pk=post_with_photo.pk).image_variants == variants
+    assert all(
+        default_storage.exists(entry["name"]) for entry in variants.values()
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_upload_is_queued_and_original_shown(
+        unlogged_client, mixer, user, published_category
+):
+    post = mixer.blend(
+        Post, author=user, category=published_category, image=None
+    )
+    post.image = _photo(800, 600)
+    post.save()
+    assert Post.objects.get(pk=post.pk).image_variants == {}
+    assert ImageJob.objects.get(post=post).image == post.image.name
+    soup = BeautifulSoup(unlogged_client.get("/").content, "html.parser")
+    assert soup.find("img", alt=post.title)["src"].endswith(post.image.name)
+
+    call_command("process_image_jobs", processes=1)
+    assert not ImageJob.objects.exists()
+    soup = BeautifulSoup(unlogged_client.get("/").content, "html.parser")
+    variants = Post.objects.get(pk=post.pk).image_variants
+    img = soup.find("img", alt=post.title)
+    assert img["src"].endswith(variants["card"]["name"])
+
+
+@pytest.mark.django_db(transaction=True)
+def test_edit_during_processing_keeps_variants(mixer, user):
+    post = mixer.blend(Post, author=user, image=None)
+    post.image = _photo(800, 600)
+    post.save()
+    # Автор редактирует публикацию, открытую до готовности вариантов.
+    form_instance = Post.objects.get(pk=post.pk)
+    call_command("process_image_jobs", processes=1)
+    form_instance.title = "Новый заголовок"
+    form_instance.save()
+    variants = Post.objects.get(pk=post.pk).image_variants
+    assert "card" in variants
+    assert form_instance.image_variants == variants
+
+
+@pytest.mark.django_db(transaction=True)
+def test_broken_upload_is_retried_then_failed(mixer, user):
+    post = mixer.blend(Post, author=user, image=None)
+    post.image = ContentFile(b"not an image", name="broken.jpg")
+    post.save()
+    call_command("process_image_jobs", processes=1)
+    job = ImageJob.objects.get(post=post)
+    assert (job.status, job.attempts) == (ImageJob.PENDING, 1)
+    assert job.last_error
+
+    ImageJob.objects.update(run_after=job.created_at)
+    call_command("process_image_jobs", processes=1, max_attempts=2)
+    job.refresh_from_db()
+    assert (job.status, job.attempts) == (ImageJob.FAILED, 2)
+    assert Post.objects.get(pk=post.pk).image_variants == {}
@@ -0,0 +1,136 @@
+import json
+from pathlib import Path
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from blog.models import Category, Comment, Location, Post, User
+from blog.search import search_post_ids
+
+DB_JSON = Path(__file__).resolve().parent.parent / "blogicum" / "db.json"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_import_fixture_matches_loaddata():
+    call_command("import_fixture", str(DB_JSON), batch_size=7, chunk_size=20)
+    fixture = json.loads(DB_JSON.read_text(encoding="utf-8"))
+    expected = {
+        (item["model"], item["pk"]) for item in fixture
+        if item["model"] in (
+            "blog.post", "blog.category", "blog.location", "auth.user"
+        )
+    }
+    imported = {
+        (model._meta.label_lower, pk)
+        for model in (Post, Category, Location, User)
+        for pk in model.objects.values_list("pk", flat=True)
+    }
+    assert imported == expected
+    first = next(item for item in fixture if item["model"] == "blog.post")
+    post = Post.objects.get(pk=first["pk"])
+    assert post.created_at.isoformat().startswith(
+        first["fields"]["created_at"][:19]
+    )
+    assert post.is_live and post.updated_at is not None
+    assert post.pk in search_post_ids(post.title)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_import_fixture_writes_each_row_once(tmp_path, mixer, user):
+    untouched = mixer.blend(Post, author=user)
+    Post.objects.filter(pk=untouched.pk).update(comment_count=7)
+    fixture = [
+        {"model": "blog.post", "pk": untouched.pk + 1, "fields": {
+            "title": "Заголовок", "text": "Текст", "author": user.pk,
+            "pub_date": "2023-01-01T00:00:00Z", "is_published": True,
+            "created_at": "2023-01-01T00:00:00Z",
+        }},
+        {"model": "blog.comment", "pk": 1, "fields": {
+            "text": "Первый!", "post": untouched.pk + 1, "author": user.pk,
+            "created_at": "2023-01-02T00:00:00Z", "is_published": True,
+        }},
+    ]
+    path = tmp_path / "fixture.json"
+    path.write_text(json.dumps(fixture), encoding="utf-8")
+    with CaptureQueriesContext(connection) as queries:
+        call_command("import_fixture", str(path))
+    # Даты не переписываются после вставки.
+    assert not any(
+        query["sql"].startswith("UPDATE") and "CASE WHEN" in query["sql"]
+        for query in queries
+    )
+    assert Post.objects.get(pk=untouched.pk + 1).created_at.year == 2023
+    assert Comment.objects.get(pk=1).created_at.day == 2
+    assert Post._meta.get_field("created_at").auto_now_add
+    assert Post._meta.get_field("updated_at").auto_now
+    # Пересчитаны только публикации с новыми комментариями.
+    assert Post.objects.get(pk=untouched.pk + 1).comment_count == 1
+    assert Post.objects.get(pk=untouched.pk).comment_count == 7
+
+
+@pytest.mark.django_db(transaction=True)
+def test_import_fixture_resolves_forward_references(tmp_path):
+    fixture = [
+        {"model": "blog.comment", "pk": 5, "fields": {
+            "text": "Первый!", "post": 3, "author": 2,
+            "created_at": "2023-01-01T00:00:00Z", "is_published": True,
+        }},
+        {"model": "blog.post", "pk": 3, "fields": {
+            "title": "Заголовок", "text": "Текст", "author": 2,
+            "pub_date": "2023-01-01T00:00:00Z", "category": None,
+            "location": None, "is_published": True,
+            "created_at": "2023-01-01T00:00:00Z",
+        }},
+        {"model": "auth.user", "pk": 2, "fields": {
+            "username": "writer", "password": "!",
+            "date_joined": "2023-01-01T00:00:00Z",
+        }},
+        {"model": "sessions.session", "pk": "key", "fields": {}},
+    ]
+    path = tmp_path / "fixture.json"
+    path.write_text(json.dumps(fixture), encoding="utf-8")
+    call_command("import_fixture", str(path), batch_size=1, chunk_size=1)
+    assert Post.objects.get(pk=3).comment_count == 1
+    assert Comment.objects.get(pk=5).author.username == "writer"
+    assert Post.objects.create(
+        title="Новая", text="Текст", author_id=2,
+        pub_date=timezone.now(),
+    ).pk > 3
+
+
+@pytest.mark.django_db(transaction=True)
+def test_import_fixture_refreshes_cached_pages(
+        tmp_path, unlogged_client, post_with_published_location,
+        post_with_another_category):
+    post = post_with_published_location
+    urls = ["/", f"/category/{post.category.slug}/", f"/posts/{post.pk}/"]
+    untouched = f"/category/{post_with_another_category.category.slug}/"
+    for url in (*urls, untouched):
+        unlogged_client.get(url)
+    fixture = [
+        {"model": "blog.post", "pk": post.pk + 100, "fields": {
+            "title": "Загруженная публикация", "text": "Текст",
+            "author": post.author_id, "category": post.category_id,
+            "pub_date": "2023-01-01T00:00:00Z", "is_published": True,
+            "created_at": "2023-01-01T00:00:00Z",
+        }},
+        {"model": "blog.comment", "pk": 1, "fields": {
+            "text": "Загруженный комментарий", "post": post.pk,
+            "author": post.author_id, "is_published": True,
+            "created_at": "2023-01-01T00:00:00Z",
+        }},
+    ]
+    path = tmp_path / "fixture.json"
+    path.write_text(json.dumps(fixture), encoding="utf-8")
+    call_command("import_fixture", str(path))
+    for url in urls[:2]:
+        content = unlogged_client.get(url).content.decode("utf-8")
+        assert "Загруженная публикация" in content, url
+    content = unlogged_client.get(urls[2]).content.decode("utf-8")
+    assert "Загруженный комментарий" in content
+    with CaptureQueriesContext(connection) as queries:
+        unlogged_client.get(untouched)
+    assert len(queries) == 0, "Страницу без изменений не нужно сбрасывать."
@@ -0,0 +1,99 @@
+from io import BytesIO
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image
+
+from blog.models import Post
+from core.storage import ContentAddressedStorage, is_content_addressed
+from core.views import serve_media
+
+
+def _photo(color):
+    buffer = BytesIO()
+    Image.new("RGB", (40, 30), color=color).save(buffer, format="JPEG")
+    return ContentFile(buffer.getvalue(), name="Photo.JPG")
+
+
+def test_same_content_is_stored_once(tmp_path):
+    storage = ContentAddressedStorage(location=tmp_path)
+    first = storage.save("a.JPG", _photo("red"))
+    second = storage.save("b.jpg", _photo("red"))
+    assert first == second
+    assert is_content_addressed(first) and first.endswith(".jpg")
+    assert storage.save("c.jpg", _photo("blue")) != first
+
+    storage.delete(first)
+    assert storage.exists(first)
+    storage.delete(first)
+    assert not storage.exists(first)
+
+
+def test_file_without_count_keeps_one_reference(tmp_path):
+    storage = ContentAddressedStorage(location=tmp_path)
+    name = storage.save("a.jpg", _photo("red"))
+    (tmp_path / (name + ".refs")).unlink()
+    storage.save("b.jpg", _photo("red"))
+    storage.delete(name)
+    assert storage.exists(name)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_replaced_image_is_released(mixer, user):
+    post = mixer.blend(Post, author=user, image=None)
+    post.image = _photo("green")
+    post.save()
+    old = post.image.name
+    twin = mixer.blend(Post, author=user, image=None)
+    twin.image = _photo("green")
+    twin.save()
+    assert twin.image.name == old
+
+    post.image = _photo("yellow")
+    post.save()
+    assert default_storage.exists(old)
+    twin.delete()
+    assert not default_storage.exists(old)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_reuploaded_image_keeps_one_reference(mixer, user):
+    post = mixer.blend(Post, author=user, image=None)
+    for _ in range(3):
+        post.image = _photo("orange")
+        post.save()
+    name = post.image.name
+    post.delete()
+    assert not default_storage.exists(name)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_rolled_back_delete_keeps_files(mixer, user):
+    post = mixer.blend(Post, author=user, image=None)
+    post.image = _photo("navy")
+    post.save()
+    variant = default_storage.save("card.jpg", _photo("white"))
+    Post.objects.filter(pk=post.pk).update(
+        image_variants={"card": {"name": variant}}
+    )
+    post.refresh_from_db()
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            post.delete()
+            raise RuntimeError
+    assert default_storage.exists(variant)
+    assert default_storage.exists(post.image.name)
+
+
+def test_media_is_served_immutable(rf, tmp_path):
+    storage = ContentAddressedStorage(location=tmp_path)
+    name = storage.save("photo.jpg", _photo("purple"))
+    response = serve_media(rf.get(f"/{name}"), name, document_root=tmp_path)
+    assert "immutable" in response["Cache-Control"]
+    (tmp_path / "legacy.jpg").write_bytes(b"")
+    response = serve_media(
+        rf.get("/legacy.jpg"), "legacy.jpg", document_root=tmp_path
+    )
+    assert not response.has_header("Cache-Control")
@@ -0,0 +1,125 @@
+import json
+import subprocess
+import sys
+
+import pytest
+from django.test import Client
+
+from core.metrics import REGISTRY
+
+
+@pytest.fixture(autouse=True)
+def clear_registry(settings):
+    settings.METRICS_SAMPLE_RATE = 1
+    REGISTRY.clear()
+    yield
+    REGISTRY.clear()
+
+
+@pytest.mark.django_db
+def test_server_timing_and_histograms(
+        settings, unlogged_client, post_with_published_location):
+    settings.DEBUG = True
+    response = unlogged_client.get("/")
+    timing = response["Server-Timing"]
+    assert "db;dur=" in timing and "tpl;dur=" in timing
+    assert "total;dur=" in timing
+
+    # Второй раз страница берётся из кэша, без SQL и шаблонов.
+    response = unlogged_client.get("/")
+    assert "0 queries" in response["Server-Timing"]
+    entry = REGISTRY.snapshot()["views"]["blog:index"]
+    assert entry["requests"] == 2
+    assert entry["cache_hits"] >= 1 and entry["cache_misses"] >= 1
+    assert entry["db_queries"]["count"] == 2
+    assert entry["db_queries"]["counts"][0] == 1
+    assert entry["template_seconds"]["sum"] > 0
+    assert entry["statuses"] == {"200": 2}
+
+
+@pytest.mark.django_db
+def test_server_timing_is_shown_to_staff_only(mixer, unlogged_client):
+    assert not unlogged_client.get("/").has_header("Server-Timing")
+    assert REGISTRY.snapshot()["views"]["blog:index"]["requests"] == 1
+    staff = Client()
+    staff.force_login(mixer.blend("auth.User", is_staff=True))
+    assert staff.get("/").has_header("Server-Timing")
+
+
+@pytest.mark.django_db
+def test_sampling_off_skips_instrumentation(settings, unlogged_client):
+    settings.METRICS_SAMPLE_RATE = 0
+    settings.DEBUG = True
+    response = unlogged_client.get("/")
+    assert not response.has_header("Server-Timing")
+    # Запрос учтён, но без замеров SQL, шаблонов и кэша.
+    entry = REGISTRY.snapshot()["views"]["blog:index"]
+    assert entry["requests"] == entry["request_seconds"]["count"] == 1
+    assert entry["statuses"] == {"200": 1}
+    assert entry["sampled_requests"] == entry["db_queries"]["count"] == 0
+    assert entry["cache_hits"] == entry["cache_misses"] == 0
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_sums_processes(
+        settings, tmp_path, client, mixer, user):
+    settings.METRICS_DIR = str(tmp_path)
+    settings.METRICS_TOKEN = "secret"
+    mixer.blend("blog.Post", author=user)
+    client.get("/")
+    # Свой файл процесс не читает — замеры не удваиваются.
+    REGISTRY.flush()
+    assert len(list(tmp_path.glob("*.json"))) == 1
+    # Замеры другого процесса сервера.
+    other = {
+        "views": {"blog:index": REGISTRY.snapshot()["views"]["blog:index"]},
+        "totals": {"posts_created": 2},
+    }
+    (tmp_path / "1-other.json").write_text(json.dumps(other))
+
+    body = client.get(
+        "/metrics", HTTP_AUTHORIZATION="Bearer secret"
+    ).content.decode()
+    assert 'blogicum_responses_total{view="blog:index",status="200"} 2' in (
+        body
+    )
+    assert (
+        'blogicum_request_duration_seconds_bucket'
+        '{view="blog:index",le="+Inf"} 2'
+    ) in body
+    assert "blogicum_posts_created_total 3" in body
+    assert "blogicum_cache_hit_ratio" in body
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", ""])
+    process.wait()
+    return process.pid
+
+
+def test_files_of_dead_processes_are_archived(settings, tmp_path):
+    settings.METRICS_DIR = str(tmp_path)
+    alive = tmp_path / "1-other.json"
+    alive.write_text(json.dumps({"views": {}, "totals": {"posts_created": 1}}))
+    for created in (2, 3):
+        (tmp_path / f"{dead_pid()}-gone.json").write_text(json.dumps(
+            {"views": {}, "totals": {"posts_created": created}}
+        ))
+        REGISTRY.flush()
+        # Файл завершившегося процесса слит в архив, суммы не изменились.
+        names = {path.name for path in tmp_path.glob("*.json")}
+        assert names == {REGISTRY.file_name, alive.name, REGISTRY.ARCHIVE}
+    assert REGISTRY.collect()["totals"]["posts_created"] == 6
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_is_private(settings, client):
+    # За обратным прокси на том же узле все запросы идут с 127.0.0.1.
+    assert client.get("/metrics").status_code == 404
+    settings.METRICS_TOKEN = "secret"
+    assert client.get(
+        "/metrics", HTTP_AUTHORIZATION="Bearer wrong"
+    ).status_code == 404
+    assert client.get(
+        "/metrics", HTTP_AUTHORIZATION="Bearer secret"
+    ).status_code == 200
@@ -0,0 +1,65 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def _get(client, url):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    assert response.status_code == HTTPStatus.OK
+    return response, len(queries)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_anonymous_pages_are_served_from_cache(
+        unlogged_client, post_with_published_location):
+    post = post_with_published_location
+    urls = [
+        "/",
+        f"/posts/{post.id}/",
+        f"/category/{post.category.slug}/",
+        f"/profile/{post.author.username}/",
+        "/pages/about/",
+    ]
+    for url in urls:
+        _get(unlogged_client, url)
+        _, n_queries = _get(unlogged_client, url)
+        assert n_queries == 0, f"Страница {url} не взята из кэша."
+
+
+@pytest.mark.django_db(transaction=True)
+def test_only_affected_pages_are_evicted(
+        mixer, unlogged_client, post_with_published_location,
+        post_with_another_category):
+    post = post_with_published_location
+    other_category_url = (
+        f"/category/{post_with_another_category.category.slug}/"
+    )
+    for url in ("/", f"/posts/{post.id}/", other_category_url):
+        _get(unlogged_client, url)
+
+    mixer.blend("blog.Comment", post=post, author=post.author)
+
+    assert _get(unlogged_client, f"/posts/{post.id}/")[1] > 0
+    assert "(1)" in _get(unlogged_client, "/")[0].content.decode("utf-8")
+    assert _get(unlogged_client, other_category_url)[1] == 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_authenticated_users_bypass_cache(
+        user_client, post_with_published_location):
+    _get(user_client, "/")
+    assert _get(user_client, "/")[1] > 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_versions_are_shared_between_processes(
+        unlogged_client, post_with_published_location, other_worker):
+    _get(unlogged_client, "/")
+    assert _get(unlogged_client, "/")[1] == 0
+    other_worker("feed")
+    assert _get(unlogged_client, "/")[1] > 0, (
+        "Версия, поднятая другим процессом, не сбросила страницу."
+    )
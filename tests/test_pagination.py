@@ -0,0 +1,115 @@
+from datetime import timedelta
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from bs4 import BeautifulSoup
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from blog import pagination
+from conftest import N_PER_PAGE
+
+
+@pytest.fixture
+def feed_posts(mixer, user, published_category):
+    now = timezone.now()
+    # Две пары публикаций с одинаковой датой — проверка разрешения ничьих.
+    pub_dates = [now - timedelta(hours=i // 2) for i in range(N_PER_PAGE * 3)]
+    return mixer.cycle(N_PER_PAGE * 3).blend(
+        "blog.Post",
+        author=user,
+        category=published_category,
+        pub_date=(date for date in pub_dates),
+    )
+
+
+def _next_href(response):
+    soup = BeautifulSoup(response.content.decode("utf-8"), "html.parser")
+    for link in soup.find_all("a", class_="page-link"):
+        if link.get_text(strip=True) == ">>":
+            return link["href"]
+    return None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_cursor_pagination_walks_whole_feed(
+        monkeypatch, unlogged_client, feed_posts):
+    monkeypatch.setattr(pagination.KeysetPaginator, "max_offset_pages", 1)
+    expected = sorted(
+        feed_posts, key=lambda post: (post.pub_date, post.pk), reverse=True
+    )
+    seen = []
+    url = "/"
+    while url:
+        response = unlogged_client.get(url)
+        assert response.status_code == HTTPStatus.OK
+        seen.extend(post.pk for post in response.context["page_obj"])
+        href = _next_href(response)
+        url = f"/{href}" if href else None
+        if href:
+            assert "cursor" in parse_qs(urlparse(href).query), (
+                "Страницы глубже max_offset_pages должны адресоваться "
+                "курсором."
+            )
+    assert seen == [post.pk for post in expected]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_deep_offset_pages_are_not_served(
+        monkeypatch, unlogged_client, feed_posts):
+    monkeypatch.setattr(pagination.KeysetPaginator, "max_offset_pages", 2)
+    assert unlogged_client.get("/?page=2").status_code == HTTPStatus.OK
+    assert unlogged_client.get("/?page=3").status_code == HTTPStatus.NOT_FOUND
+    assert (
+        unlogged_client.get("/?cursor=garbage").status_code
+        == HTTPStatus.NOT_FOUND
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_last_page_cursor(unlogged_client, feed_posts):
+    cursor = pagination.encode_cursor(pagination.PREVIOUS)
+    response = unlogged_client.get(f"/?cursor={cursor}")
+    assert response.status_code == HTTPStatus.OK
+    oldest = sorted(feed_posts, key=lambda post: (post.pub_date, post.pk))
+    assert [post.pk for post in response.context["page_obj"]] == [
+        post.pk for post in reversed(oldest[:N_PER_PAGE])
+    ]
+
+
+def _count_queries(client, url):
+    with CaptureQueriesContext(connection) as queries:
+        assert client.get(url).status_code == HTTPStatus.OK
+    return [q["sql"] for q in queries if "COUNT(*)" in q["sql"]]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_paginator_count_is_cached_until_publication_changes(
+        user_client, feed_posts):
+    assert len(_count_queries(user_client, "/")) == 1
+    assert len(_count_queries(user_client, "/")) == 0
+
+    post = feed_posts[0]
+    post.is_published = False
+    post.save()
+    response = user_client.get("/")
+    assert response.context["paginator"].count == len(feed_posts) - 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_paginator_count_is_recounted_after_change_in_other_worker(
+        user_client, feed_posts, other_worker):
+    assert len(_count_queries(user_client, "/")) == 1
+    other_worker("feed")
+    assert len(_count_queries(user_client, "/")) == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_paginator_count_stops_at_last_numbered_page(
+        monkeypatch, user_client, feed_posts):
+    monkeypatch.setattr(pagination.KeysetPaginator, "max_offset_pages", 1)
+    response = user_client.get("/")
+    assert response.context["paginator"].count == N_PER_PAGE + 1
+    assert "cursor=" in response.context["page_obj"].last_query
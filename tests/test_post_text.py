@@ -0,0 +1,63 @@
+import json
+
+import pytest
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from blog.models import Post
+
+
+@pytest.mark.django_db
+def test_excerpt_and_html_are_rendered_on_save(mixer, user):
+    post = mixer.blend(
+        Post, author=user, text="<b>раз</b>\n" + " ".join(["слово"] * 20)
+    )
+    assert post.excerpt == "<b>раз</b> " + " ".join(["слово"] * 9) + " …"
+    assert post.text_html.startswith("&lt;b&gt;раз&lt;/b&gt;<br>")
+
+    post.text = "новый текст"
+    post.save(update_fields=["text"])
+    post.refresh_from_db()
+    assert (post.excerpt, post.text_html) == ("новый текст", "новый текст")
+
+
+@pytest.mark.django_db
+def test_feed_does_not_load_post_bodies(
+        unlogged_client, post_with_published_location):
+    with CaptureQueriesContext(connection) as queries:
+        response = unlogged_client.get("/")
+    assert post_with_published_location.excerpt in response.content.decode()
+    for column in ('"blog_post"."text"', '"blog_post"."text_html"'):
+        assert not any(column in query["sql"] for query in queries)
+
+
+@pytest.mark.django_db
+def test_render_post_text_command(
+        unlogged_client, post_with_published_location):
+    caches["default"].set("unrelated", 1)
+    Post.objects.update(excerpt="", text_html="")
+    assert unlogged_client.get("/").status_code == 200
+    call_command("render_post_text", batch_size=1, missing_only=True)
+    post = Post.objects.get(pk=post_with_published_location.pk)
+    assert post.excerpt and post.text_html
+    assert post.card_version > post_with_published_location.card_version
+    # Закэшированная лента обновилась, а посторонние ключи остались.
+    assert post.excerpt in unlogged_client.get("/").content.decode()
+    assert caches["default"].get("unrelated") == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_loaddata_renders_text(tmp_path, user):
+    fixture = [{"model": "blog.post", "pk": 1, "fields": {
+        "title": "Заголовок", "text": "Первая строка\nвторая",
+        "author": user.pk, "pub_date": "2023-01-01T00:00:00Z",
+        "is_published": True, "created_at": "2023-01-01T00:00:00Z",
+    }}]
+    path = tmp_path / "fixture.json"
+    path.write_text(json.dumps(fixture), encoding="utf-8")
+    call_command("loaddata", str(path), verbosity=0)
+    post = Post.objects.get(pk=1)
+    assert post.excerpt == "Первая строка вторая"
+    assert post.text_html == "Первая строка<br>вторая"
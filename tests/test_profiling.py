@@ -0,0 +1,46 @@
+import json
+import pstats
+
+import pytest
+from django.test import Client
+
+
+@pytest.fixture
+def profile_dir(settings, tmp_path):
+    settings.PROFILE_DIR = str(tmp_path)
+    settings.PROFILE_INTERVAL = 0.001
+    return tmp_path
+
+
+@pytest.mark.django_db
+def test_staff_can_profile_a_request(profile_dir, mixer, user):
+    staff = mixer.blend("auth.User", is_staff=True)
+    client = Client()
+    client.force_login(staff)
+    response = client.get(
+        f"/profile/{user.username}/", HTTP_X_PROFILE="1"
+    )
+    name = response["X-Profile-Id"]
+    assert "blog_profile" in name
+    details = json.loads((profile_dir / f"{name}.json").read_text())
+    assert details["view"] == "blog:profile"
+    assert details["status"] == 200
+    assert any("auth_user" in query["sql"] for query in details["queries"])
+    stats = pstats.Stats(str(profile_dir / f"{name}.prof"))
+    assert stats.total_calls > 0
+    assert (profile_dir / f"{name}.folded").exists()
+
+
+@pytest.mark.django_db
+def test_profile_flag_is_ignored_for_visitors(profile_dir, user_client):
+    response = user_client.get("/?_profile=1")
+    assert not response.has_header("X-Profile-Id")
+    assert not list(profile_dir.iterdir())
+
+
+@pytest.mark.django_db
+def test_sampled_profiles(profile_dir, settings, client):
+    settings.PROFILE_SAMPLE_RATE = 1
+    # Профиль записан, но имя файла посетителю не сообщается.
+    assert not client.get("/").has_header("X-Profile-Id")
+    assert len(list(profile_dir.glob("*.json"))) == 1
@@ -0,0 +1,62 @@
+import json
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from blog.models import Post
+
+
+@pytest.mark.django_db(transaction=True)
+def test_scheduled_post_goes_live_when_its_date_arrives(
+        mixer, user, published_category, unlogged_client):
+    post = mixer.blend(
+        "blog.Post",
+        author=user,
+        category=published_category,
+        pub_date=timezone.now() + timedelta(days=1),
+    )
+    assert not post.is_live
+    assert post not in unlogged_client.get("/").context["page_obj"]
+
+    # Время «наступило»: дата в прошлом, а флаг ещё не поднят.
+    Post.objects.filter(pk=post.pk).update(
+        pub_date=timezone.now() - timedelta(minutes=1)
+    )
+    call_command("publish_scheduled")
+
+    post.refresh_from_db()
+    assert post.is_live
+    assert post in unlogged_client.get("/").context["page_obj"]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_pub_date_in_update_fields_updates_is_live(mixer, user):
+    post = mixer.blend(
+        "blog.Post", author=user, pub_date=timezone.now() + timedelta(days=1)
+    )
+    post.pub_date = timezone.now() - timedelta(minutes=1)
+    post.save(update_fields=["pub_date"])
+    assert Post.objects.get(pk=post.pk).is_live
+
+
+@pytest.mark.django_db(transaction=True)
+def test_loaddata_sets_is_live(tmp_path, user):
+    fixture = [
+        {"model": "blog.post", "pk": pk, "fields": {
+            "title": "Заголовок", "text": "Текст", "author": user.pk,
+            "pub_date": pub_date.isoformat(), "is_published": True,
+            "created_at": "2023-01-01T00:00:00Z",
+        }}
+        for pk, pub_date in (
+            (1, timezone.now() - timedelta(days=1)),
+            (2, timezone.now() + timedelta(days=1)),
+        )
+    ]
+    path = tmp_path / "fixture.json"
+    path.write_text(json.dumps(fixture), encoding="utf-8")
+    call_command("loaddata", str(path), verbosity=0)
+    assert dict(Post.objects.values_list("pk", "is_live")) == {
+        1: True, 2: False,
+    }
@@ -0,0 +1,127 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from blog import urls as blog_urls
+from conftest import N_PER_PAGE
+
+# Как обращаться к каждому маршруту blog/urls.py: метод и тело запроса.
+ROUTE_REQUESTS = {
+    "index": ("get", None),
+    "post_detail": ("get", None),
+    "edit_post": ("get", None),
+    "delete_post": ("get", None),
+    "comments": ("get", None),
+    "add_comment": ("post", {"text": "Ещё один комментарий"}),
+    "edit_comment": ("get", None),
+    "delete_comment": ("get", None),
+    "create_post": ("get", None),
+    "category_posts": ("get", None),
+    "edit_profile": ("get", None),
+    "profile": ("get", None),
+    "search": ("get", {"q": "текст"}),
+    "feed": ("get", None),
+    "category_feed": ("get", None),
+    "profile_feed": ("get", None),
+}
+
+
+@pytest.fixture
+def busy_post(mixer, user, another_user, published_category,
+              published_locations):
+    posts = mixer.cycle(N_PER_PAGE + 2).blend(
+        "blog.Post",
+        author=user,
+        category=published_category,
+        location=mixer.sequence(*published_locations),
+    )
+    post = posts[0]
+    mixer.cycle(N_PER_PAGE).blend(
+        "blog.Comment", post=post, author=mixer.sequence(user, another_user)
+    )
+    return post
+
+
+def _route_kwargs(name, post, user):
+    comment = post.comment.filter(author=user).first()
+    return {
+        "post_detail": {"post_id": post.id},
+        "edit_post": {"post_id": post.id},
+        "delete_post": {"post_id": post.id},
+        "comments": {"post_id": post.id},
+        "add_comment": {"post_id": post.id},
+        "edit_comment": {"post_id": post.id, "comment_id": comment.id},
+        "delete_comment": {"post_id": post.id, "comment_id": comment.id},
+        "category_posts": {"category_slug": post.category.slug},
+        "profile": {"username": user.username},
+        "feed": {"feed_format": "rss"},
+        "category_feed": {
+            "category_slug": post.category.slug, "feed_format": "atom"
+        },
+        "profile_feed": {"username": user.username, "feed_format": "rss"},
+    }.get(name, {})
+
+
+def test_every_route_declares_a_budget():
+    route_names = {pattern.name for pattern in blog_urls.urlpatterns}
+    assert route_names == set(ROUTE_REQUESTS), (
+        "Добавьте новый маршрут в ROUTE_REQUESTS, чтобы проверялся его "
+        "бюджет запросов."
+    )
+    for pattern in blog_urls.urlpatterns:
+        budget = getattr(pattern.callback.view_class, "query_budget", None)
+        assert isinstance(budget, int), (
+            f"У представления маршрута `{pattern.name}` не задан "
+            "атрибут query_budget."
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize("viewer", ["client", "user_client"])
+@pytest.mark.parametrize("name", sorted(ROUTE_REQUESTS))
+def test_route_stays_within_query_budget(name, viewer, request, user,
+                                         busy_post):
+    client = request.getfixturevalue(viewer)
+    method, data = ROUTE_REQUESTS[name]
+    url = reverse(f"blog:{name}", kwargs=_route_kwargs(name, busy_post, user))
+    budget = resolve(url).func.view_class.query_budget
+    # Повторный запрос проходит через закэшированные страницы и счётчики.
+    for attempt in ("первый", "повторный"):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(client, method)(url, data)
+            if response.streaming:
+                b"".join(response.streaming_content)
+        assert response.status_code in (HTTPStatus.OK, HTTPStatus.FOUND)
+        assert len(queries) <= budget, (
+            f"`blog:{name}` ({viewer}, {attempt} запрос) выполнил "
+            f"{len(queries)} запросов при бюджете {budget}:\n"
+            + "\n".join(query["sql"] for query in queries.captured_queries)
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize(
+    "name, lookup",
+    [
+        ("category_posts", 'FROM "blog_category" WHERE'),
+        # Пользователя сессии ищут по id, профиль — по username.
+        ("profile", 'WHERE "auth_user"."username" ='),
+        ("edit_post", 'WHERE "blog_post"."id" ='),
+        ("delete_post", 'WHERE "blog_post"."id" ='),
+        ("edit_comment", 'WHERE "blog_comment"."id" ='),
+        ("delete_comment", 'WHERE "blog_comment"."id" ='),
+    ],
+)
+def test_view_object_is_fetched_once(name, lookup, user, user_client,
+                                     busy_post):
+    url = reverse(f"blog:{name}", kwargs=_route_kwargs(name, busy_post, user))
+    with CaptureQueriesContext(connection) as queries:
+        assert user_client.get(url).status_code == HTTPStatus.OK
+    lookups = [
+        query["sql"] for query in queries.captured_queries
+        if query["sql"].startswith("SELECT") and lookup in query["sql"]
+    ]
+    assert len(lookups) == 1, "\n".join(lookups)
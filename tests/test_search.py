@@ -0,0 +1,71 @@
+from http import HTTPStatus
+
+import pytest
+from django.core.management import call_command
+
+from blog import search
+from blog.models import Comment, Post
+
+
+def _found(client, query):
+    response = client.get("/search/", {"q": query})
+    assert response.status_code == HTTPStatus.OK
+    return [post.pk for post in response.context["page_obj"]]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_search_follows_post_and_comment_writes(
+        mixer, user, unlogged_client, post_with_published_location,
+        post_of_another_author):
+    post = post_with_published_location
+    post.title = "Восхождение на Эльбрус"
+    post.save()
+    assert _found(unlogged_client, "эльбрус") == [post.pk]
+    assert _found(unlogged_client, "восх") == [post.pk]
+
+    comment = mixer.blend(
+        Comment, post=post_of_another_author, author=user,
+        text="Казбек выше, чем кажется",
+    )
+    assert _found(unlogged_client, "казбек") == [post_of_another_author.pk]
+
+    comment.delete()
+    post.is_published = False
+    post.save()
+    assert _found(unlogged_client, "казбек") == []
+    assert _found(unlogged_client, "эльбрус") == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_search_ranks_title_matches_first(
+        mixer, user, unlogged_client, published_category):
+    in_text, in_title = mixer.cycle(2).blend(
+        Post, author=user, category=published_category,
+        title=mixer.sequence("Заметки", "Байкал зимой"),
+        text=mixer.sequence("Про Байкал и не только", "Лёд и холод"),
+    )
+    assert _found(unlogged_client, "байкал") == [in_title.pk, in_text.pk]
+    assert _found(unlogged_client, '"OR * (') == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_rebuild_search_index_command(
+        unlogged_client, post_with_published_location):
+    post = post_with_published_location
+    Post.objects.filter(pk=post.pk).update(title="Онежское озеро")
+    assert _found(unlogged_client, "онежское") == []
+    call_command("rebuild_search_index", batch_size=1)
+    assert _found(unlogged_client, "онежское") == [post.pk]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_hidden_matches_do_not_use_up_the_results_limit(
+        monkeypatch, mixer, user, unlogged_client, published_category):
+    monkeypatch.setattr(search, "RESULTS_LIMIT", 1)
+    hidden, visible = mixer.cycle(2).blend(
+        Post, author=user, category=published_category,
+        title=mixer.sequence("Онега", "Заметки"),
+        text=mixer.sequence("Онега", "Про Онегу"),
+        is_published=mixer.sequence(False, True),
+    )
+    assert _found(unlogged_client, "онег") == [visible.pk]
@@ -0,0 +1,87 @@
+import json
+import logging
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.slow_queries import (
+    LOGGER_NAME, JsonLinesFileHandler, JsonLinesFormatter, install,
+)
+
+
+@pytest.fixture
+def slow_queries(settings, caplog):
+    settings.SLOW_QUERY_THRESHOLD = 0
+    install(None, connection)
+    logger = logging.getLogger(LOGGER_NAME)
+    # Без файлового обработчика из settings.LOGGING.
+    handlers = logger.handlers
+    logger.handlers = [caplog.handler]
+    yield lambda: [
+        record.slow_query for record in caplog.records
+        if record.name == LOGGER_NAME
+    ]
+    logger.handlers = handlers
+
+
+@pytest.mark.django_db
+def test_slow_query_is_logged_with_view_plan_and_stack(
+        slow_queries, caplog, client, mixer, user, published_category):
+    mixer.blend("blog.Post", author=user, category=published_category)
+    assert all(entry["view"] is None for entry in slow_queries())
+    caplog.clear()
+    response = client.get(f"/category/{published_category.slug}/")
+    assert response.status_code == 200
+    entries = [
+        entry for entry in slow_queries()
+        if entry["sql"].startswith('SELECT "blog_post"')
+    ]
+    assert entries
+    entry = entries[0]
+    assert entry["view"] == "blog:category_posts"
+    assert entry["plan"]
+    assert entry["origin"].startswith(("blog/", "core/"))
+    assert entry["origin"] == entry["stack"][0]
+    assert all(
+        not frame.startswith("core/slow_queries.py")
+        for frame in entry["stack"]
+    )
+
+
+@pytest.mark.django_db
+def test_explain_is_not_counted_as_a_query(slow_queries, client, mixer, user):
+    mixer.blend("blog.Post", author=user)
+    with CaptureQueriesContext(connection) as queries:
+        client.get("/")
+    assert any(entry["plan"] for entry in slow_queries())
+    assert not any(
+        "EXPLAIN" in query["sql"] for query in queries.captured_queries
+    )
+    assert not any("EXPLAIN" in entry["sql"] for entry in slow_queries())
+
+
+@pytest.mark.django_db
+def test_threshold_filters_queries(slow_queries, settings, client):
+    settings.SLOW_QUERY_THRESHOLD = 60
+    client.get("/")
+    assert not slow_queries()
+
+
+def test_json_lines_are_rotated(tmp_path):
+    path = tmp_path / "logs" / "slow.jsonl"
+    handler = JsonLinesFileHandler(str(path), maxBytes=200, backupCount=2)
+    handler.setFormatter(JsonLinesFormatter())
+    record = logging.LogRecord(
+        LOGGER_NAME, logging.WARNING, __file__, 0, "slow", (), None
+    )
+    record.slow_query = {"view": "blog:index", "sql": "SELECT 1"}
+    try:
+        for _ in range(10):
+            handler.emit(record)
+    finally:
+        handler.close()
+    lines = path.read_text().splitlines()
+    assert json.loads(lines[0])["view"] == "blog:index"
+    assert (tmp_path / "logs" / "slow.jsonl.1").exists()
+    assert not (tmp_path / "logs" / "slow.jsonl.3").exists()
@@ -0,0 +1,89 @@
+import logging
+from unittest import mock
+
+import pytest
+from django.template import Context, Template
+from django.template.base import Node
+from django.template.defaulttags import URLNode
+from django.test import Client
+
+from core import template_timing
+from core.template_timing import LOGGER_NAME, TemplateTimings
+
+TEMPLATE_RENDER = Template.render
+
+
+@pytest.fixture
+def installed():
+    template_timing.install()
+    yield
+    template_timing.uninstall()
+
+
+@pytest.fixture
+def timing_log(settings, caplog, installed):
+    settings.TEMPLATE_TIMING_SAMPLE_RATE = 1
+    settings.TEMPLATE_TIMING_TOP = 50
+    logger = logging.getLogger(LOGGER_NAME)
+    handlers = logger.handlers
+    logger.handlers = [caplog.handler]
+    yield lambda: [
+        record.getMessage() for record in caplog.records
+        if record.name == LOGGER_NAME
+    ]
+    logger.handlers = handlers
+
+
+@pytest.mark.django_db
+def test_feed_page_reports_includes_and_tags(
+        timing_log, mixer, user, published_category):
+    mixer.cycle(3).blend(
+        "blog.Post", author=user, category=published_category
+    )
+    assert Client().get("/").status_code == 200
+    line, = timing_log()
+    assert line.startswith("blog:index: ")
+    assert "includes/post_card.html ×3" in line
+    assert "includes/category_link.html ×3" in line
+    assert "{% url 'blog:post_detail' %}" in line
+
+
+def test_own_time_excludes_nested_calls(installed):
+    timings = TemplateTimings()
+    token = template_timing.current.set(timings)
+    try:
+        Template(
+            "{% for i in items %}{% url 'blog:index' %}{% endfor %}"
+        ).render(Context({"items": range(5)}))
+    finally:
+        template_timing.current.reset(token)
+    (page, (_, page_total, page_own)), = [
+        item for item in timings.entries.items() if "url" not in item[0]
+    ]
+    calls, url_total, url_own = timings.entries["{% url 'blog:index' %}"]
+    assert calls == 5
+    assert url_total == url_own
+    assert page_own == pytest.approx(page_total - url_total)
+    assert timings.total == pytest.approx(page_total)
+
+
+@pytest.mark.django_db
+def test_untimed_requests_pass_through(timing_log, settings, mixer, user):
+    mixer.blend("blog.Post", author=user)
+    settings.TEMPLATE_TIMING_SAMPLE_RATE = 0.5
+    # Запрос вне выборки: обёртки стоят, но ничего не пишут.
+    with mock.patch("core.middleware.random.random", return_value=0.9):
+        assert Client().get("/").status_code == 200
+    assert not timing_log()
+    # Тот же запрос в выборке замеряется (другой адрес — мимо кэша).
+    with mock.patch("core.middleware.random.random", return_value=0.1):
+        assert Client().get("/?page=1").status_code == 200
+    assert len(timing_log()) == 1
+
+
+def test_uninstall_restores_render_methods(installed):
+    assert Template.render is not TEMPLATE_RENDER
+    assert URLNode.render_annotated is not Node.render_annotated
+    template_timing.uninstall()
+    assert Template.render is TEMPLATE_RENDER
+    assert "render_annotated" not in URLNode.__dict__